@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+import pandas as pd
+from precios import descargar_en_paralelo
+from diagnostico import medido, contar, anotar_carga
+
+RUTA_ALMACEN = os.environ.get("RUTA_ALMACEN", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "ohlcv.sqlite"))
+COLUMNAS = ["Open", "High", "Low", "Close", "Volume", "Dividends", "Stock Splits"]
+FRESCURA = {"5m": 60, "15m": 120, "1d": 600}
+
+def _crear_tablas(con):
+    con.execute("""CREATE TABLE IF NOT EXISTS ohlcv (ticker TEXT, intervalo TEXT, ts TEXT, open REAL, high REAL, low REAL, close REAL, volume REAL, dividends REAL, splits REAL, PRIMARY KEY (ticker, intervalo, ts))""")
+    con.execute("""CREATE TABLE IF NOT EXISTS series (ticker TEXT, intervalo TEXT, desde TEXT, actualizado REAL, PRIMARY KEY (ticker, intervalo))""")
+
+@contextmanager
+def conectar():
+    os.makedirs(os.path.dirname(RUTA_ALMACEN), exist_ok=True)
+    con = sqlite3.connect(RUTA_ALMACEN, timeout=30)
+    try:
+        con.execute("PRAGMA journal_mode=WAL")
+        _crear_tablas(con)
+        with con: yield con
+    finally: con.close()
+
+def inicio_periodo(periodo, ahora=None):
+    ahora = (ahora or pd.Timestamp.now()).normalize()
+    if periodo.endswith("mo"): return ahora - pd.DateOffset(months=int(periodo[:-2]))
+    if periodo.endswith("y"): return ahora - pd.DateOffset(years=int(periodo[:-1]))
+    if periodo.endswith("d"): return ahora - pd.Timedelta(days=int(periodo[:-1]))
+    raise ValueError(f"Período no soportado: {periodo}")
+
+def _estado(con, ticker, intervalo):
+    fila = con.execute("SELECT desde, actualizado FROM series WHERE ticker=? AND intervalo=?", (ticker, intervalo)).fetchone()
+    if not fila: return None
+    ultimo = con.execute("SELECT MAX(ts) FROM ohlcv WHERE ticker=? AND intervalo=?", (ticker, intervalo)).fetchone()[0]
+    return {"desde": pd.Timestamp(fila[0]), "actualizado": fila[1], "ultimo": pd.Timestamp(ultimo) if ultimo else None}
+
+def _guardar(con, ticker, intervalo, hist, desde=None):
+    if not hist.empty:
+        hist = hist.reindex(columns=COLUMNAS).fillna({"Dividends": 0.0, "Stock Splits": 0.0})
+        filas = zip([ticker] * len(hist), [intervalo] * len(hist), hist.index.strftime("%Y-%m-%d %H:%M:%S"), *(hist[c].astype(float).tolist() for c in COLUMNAS))
+        con.executemany("INSERT OR REPLACE INTO ohlcv VALUES (?,?,?,?,?,?,?,?,?,?)", filas)
+    if desde is not None:
+        con.execute("INSERT OR REPLACE INTO series VALUES (?,?,?,?)", (ticker, intervalo, desde.strftime("%Y-%m-%d"), time.time()))
+    else:
+        con.execute("UPDATE series SET actualizado=? WHERE ticker=? AND intervalo=?", (time.time(), ticker, intervalo))
+
+def _leer(con, ticker, intervalo, periodo):
+    desde = inicio_periodo(periodo)
+    if periodo.endswith("d"):
+        # "5d" en Yahoo son 5 sesiones, no 5 días corridos
+        dias = con.execute("SELECT DISTINCT substr(ts, 1, 10) AS d FROM ohlcv WHERE ticker=? AND intervalo=? ORDER BY d DESC LIMIT ?", (ticker, intervalo, int(periodo[:-1]))).fetchall()
+        if dias: desde = pd.Timestamp(dias[-1][0])
+    df = pd.read_sql_query("SELECT ts, open, high, low, close, volume, dividends, splits FROM ohlcv WHERE ticker=? AND intervalo=? AND ts>=? ORDER BY ts", con, params=(ticker, intervalo, desde.strftime("%Y-%m-%d %H:%M:%S")), parse_dates=["ts"], index_col="ts")
+    df.columns = COLUMNAS
+    df.index.name = "Date" if intervalo == "1d" else "Datetime"
+    return df
+
+@medido("almacen.historiales")
+def obtener_historiales(tickers, periodo, intervalo, sin_red=False):
+    t0 = time.perf_counter()
+    desde = inicio_periodo(periodo)
+    peticiones, completas, ultimos = {}, set(), {}
+    with conectar() as con:
+        for ticker in dict.fromkeys(tickers):
+            estado = _estado(con, ticker, intervalo)
+            if estado is None or estado["ultimo"] is None or estado["desde"] > desde:
+                peticiones[ticker] = {"period": periodo, "interval": intervalo}
+                completas.add(ticker)
+            elif time.time() - estado["actualizado"] > FRESCURA.get(intervalo, 600):
+                ultimos[ticker] = estado["ultimo"]
+                peticiones[ticker] = {"start": estado["ultimo"].strftime("%Y-%m-%d"), "interval": intervalo}
+    contar("almacen", "acierto", len(dict.fromkeys(tickers)) - len(peticiones))
+    if sin_red: contar("almacen", "sin_red", len(peticiones))
+    else: contar("almacen", "delta", len(peticiones) - len(completas)); contar("almacen", "completa", len(completas))
+    descargas = {} if sin_red else descargar_en_paralelo(peticiones)
+    with conectar() as con:
+        for ticker, hist in descargas.items():
+            if hist.empty: continue
+            nuevas = hist[hist.index > ultimos[ticker]] if ticker in ultimos else hist
+            if ticker not in completas and nuevas.reindex(columns=["Dividends", "Stock Splits"]).fillna(0).abs().to_numpy().sum() > 0:
+                # Un dividendo o split reajusta toda la serie: se baja completa otra vez
+                completa = descargar_en_paralelo({ticker: {"period": periodo, "interval": intervalo}})[ticker]
+                if not completa.empty:
+                    con.execute("DELETE FROM ohlcv WHERE ticker=? AND intervalo=?", (ticker, intervalo))
+                    hist = completa
+                    completas.add(ticker)
+            _guardar(con, ticker, intervalo, hist, desde if ticker in completas else None)
+        historiales = {t: _leer(con, t, intervalo, periodo) for t in dict.fromkeys(tickers)}
+    anotar_carga({"periodo": periodo, "intervalo": intervalo, "tickers": len(historiales), "sin_red": sin_red, "completas": len(completas & descargas.keys()), "deltas": len(descargas.keys() - completas), "segundos": time.perf_counter() - t0})
+    return historiales
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from divisas import a_fechas_locales, dolar_en
+
+DIAS_HABILES = 252
+MIN_ANIOS_MWR = 1 / 12
+
+def matriz_precios(datos_portafolio, tickers=None, clave="full"):
+    tickers = [t for t in (tickers or datos_portafolio) if t in datos_portafolio]
+    if not tickers: return pd.DataFrame()
+    precios = pd.concat({t: datos_portafolio[t][clave]['Close'] for t in tickers}, axis=1, sort=True)
+    return precios.ffill()
+
+def matriz_cuotas(df_tx, fechas, tickers):
+    vacia = pd.DataFrame(0.0, index=fechas, columns=tickers)
+    if df_tx.empty or not len(tickers): return vacia
+    tx = df_tx[df_tx['ticker'].isin(tickers)]
+    if tx.empty: return vacia
+    signo = np.select([tx['tipo'] == 'COMPRA', tx['tipo'] == 'VENTA'], [1.0, -1.0], 0.0)
+    flujos = pd.DataFrame({"fecha": a_fechas_locales(tx['fecha'], tx['ticker']).to_numpy(), "ticker": tx['ticker'].to_numpy(), "cuotas": tx['cantidad'].astype(float).to_numpy() * signo})
+    if (pd.DatetimeIndex(fechas) == pd.DatetimeIndex(fechas).normalize()).all():
+        # En barras diarias una operación del día cuenta para el cierre de ese día
+        flujos["fecha"] = flujos["fecha"].dt.normalize()
+    flujos = flujos.dropna(subset=["fecha"]).pivot_table(index="fecha", columns="ticker", values="cuotas", aggfunc="sum").sort_index()
+    # Una venta mayor a la posición la deja en cero, como en libro_mayor: el piso se aplica en cada paso, no al final
+    suma = flujos.fillna(0.0).cumsum()
+    acumuladas = (suma - np.minimum(suma.cummin(), 0.0)).reindex(columns=tickers, fill_value=0.0)
+    return acumuladas.reindex(fechas, method="ffill").fillna(0.0)
+
+def valorizar_clp(precios, cuotas, serie_fx):
+    p, q = precios.to_numpy(dtype=float), cuotas.to_numpy(dtype=float)
+    valor_usd = np.nansum(p * q, axis=1)
+    # Aportes (+) y retiros (-) valorizados al cierre del día en que cambia la posición
+    flujo_usd = np.nansum(np.diff(q, axis=0, prepend=0.0) * p, axis=1)
+    fx = dolar_en(precios.index, serie_fx)
+    return pd.DataFrame({"usd": valor_usd, "fx": fx, "clp": valor_usd * fx, "flujo_usd": flujo_usd, "flujo_clp": flujo_usd * fx}, index=precios.index)
+
+def resumen_clp(posiciones, precios_actuales, ganancia_realizada_clp, dolar_hoy, tasa_impuesto):
+    activos = [t for t, p in posiciones.items() if p['cuotas'] > 0]
+    invertido = sum(posiciones[t]['costo_total_clp'] for t in activos)
+    actual = sum(posiciones[t]['cuotas'] * precios_actuales[t] for t in activos if t in precios_actuales) * dolar_hoy
+    flotante = actual - invertido
+    provision = ganancia_realizada_clp * (tasa_impuesto / 100) if ganancia_realizada_clp > 0 else 0.0
+    return {"invertido": invertido, "actual": actual, "flotante": flotante, "realizada": ganancia_realizada_clp, "provision": provision, "neto": flotante + ganancia_realizada_clp - provision}
+
+def curva_patrimonio(datos_portafolio, df_tx, serie_fx):
+    tickers = [t for t in df_tx['ticker'].unique() if t in datos_portafolio] if not df_tx.empty else []
+    precios = matriz_precios(datos_portafolio, tickers)
+    if precios.empty: return pd.DataFrame(columns=["usd", "fx", "clp", "flujo_usd", "flujo_clp"])
+    return valorizar_clp(precios, matriz_cuotas(df_tx, precios.index, tickers), serie_fx)
+
+def periodos_por_anio(fechas):
+    fechas = pd.DatetimeIndex(fechas)
+    if len(fechas) < 2: return DIAS_HABILES
+    return DIAS_HABILES * max(1.0, len(fechas) / fechas.normalize().nunique())
+
+def retornos_periodo(valores, flujos):
+    anteriores = valores[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        retornos = (valores[1:] - flujos[1:]) / anteriores - 1.0
+    retornos[~(anteriores > 0)] = np.nan
+    return np.maximum(retornos, -1.0)
+
+def tir(montos, anios):
+    # TIR (XIRR) por bisección sobre log(1 + tasa): montos desde el punto de vista del inversionista.
+    # En log, un 2% diario anualizado (~1.400x) sigue dentro del rango y exp no desborda
+    if not (montos > 0).any() or not (montos < 0).any(): return np.nan
+    def signo(x):
+        # Solo importa el signo del VPN: se factoriza el mayor exp(-x * t)
+        exponentes = -x * anios
+        return np.sign(np.sum(montos * np.exp(exponentes - exponentes.max())))
+    bajo, alto = -30.0, 30.0
+    signo_bajo = signo(bajo)
+    if signo_bajo * signo(alto) > 0: return np.nan
+    for _ in range(200):
+        medio = (bajo + alto) / 2
+        signo_medio = signo(medio)
+        if signo_bajo * signo_medio <= 0: alto = medio
+        else: bajo, signo_bajo = medio, signo_medio
+        if alto - bajo < 1e-12: break
+    return float(np.expm1((bajo + alto) / 2))
+
+def metricas_cartera(valores, flujos, fechas, tasa_libre_riesgo=0.0):
+    valores, flujos = np.asarray(valores, dtype=float), np.asarray(flujos, dtype=float)
+    metricas = {"twr": np.nan, "mwr": np.nan, "mwr_anual": True, "max_drawdown": np.nan, "volatilidad": np.nan, "sharpe": np.nan}
+    if len(valores) < 2: return metricas, np.array([])
+    retornos = retornos_periodo(valores, flujos)
+    validos = ~np.isnan(retornos)
+    if validos.any():
+        ppy = periodos_por_anio(fechas)
+        indice = np.cumprod(1.0 + np.where(validos, retornos, 0.0))
+        metricas["twr"] = float(indice[-1] - 1.0)
+        metricas["max_drawdown"] = float(np.min(indice / np.maximum.accumulate(indice) - 1.0))
+        if validos.sum() > 1:
+            metricas["volatilidad"] = float(np.std(retornos[validos], ddof=1) * np.sqrt(ppy))
+            if metricas["volatilidad"] > 0: metricas["sharpe"] = (float(np.mean(retornos[validos])) * ppy - tasa_libre_riesgo) / metricas["volatilidad"]
+    fechas = pd.DatetimeIndex(fechas)
+    anios = (fechas - fechas[0]).total_seconds().to_numpy() / (365.25 * 86400)
+    montos = -flujos.copy()
+    montos[0] = -valores[0]
+    montos[-1] += valores[-1]
+    # En ventanas de menos de un mes la tasa anualizada no dice nada: se informa la del período
+    metricas["mwr_anual"] = bool(anios[-1] >= MIN_ANIOS_MWR)
+    metricas["mwr"] = tir(montos, anios if metricas["mwr_anual"] else anios / anios[-1]) if anios[-1] > 0 else np.nan
+    return metricas, retornos
+
+def analizar_cartera(datos_portafolio, df_tx, serie_fx, desde=None, tasa_libre_riesgo=0.0, curva=None):
+    if curva is None: curva = curva_patrimonio(datos_portafolio, df_tx, serie_fx)
+    if desde is not None: curva = curva[curva.index >= desde]
+    tickers = [t for t in df_tx['ticker'].unique() if t in datos_portafolio] if not df_tx.empty else []
+    resultado = {"curva": curva, "metricas": {}, "correlacion": pd.DataFrame()}
+    if len(curva) < 2: return resultado
+    for moneda in ("usd", "clp"):
+        resultado["metricas"][moneda] = metricas_cartera(curva[moneda].to_numpy(), curva["flujo_" + moneda].to_numpy(), curva.index, tasa_libre_riesgo)[0]
+    precios = matriz_precios(datos_portafolio, tickers)
+    if desde is not None: precios = precios[precios.index >= desde]
+    if precios.shape[1] > 1: resultado["correlacion"] = precios.pct_change(fill_method=None).corr()
+    return resultado
@@ -0,0 +1,57 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from analitica import analizar_cartera, matriz_cuotas
+from libro_mayor import calcular_libro_mayor
+
+def generar(n_tickers=100, anios=5, n_tx=5000, semilla=0):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=252 * anios)
+    precios = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (len(fechas), n_tickers)), axis=0))
+    tickers = [f"T{i:03d}" for i in range(n_tickers)]
+    datos = {t: {"full": pd.DataFrame({"Close": precios[:, i]}, index=fechas)} for i, t in enumerate(tickers)}
+    for d in datos.values(): d["inicio"], d["fin"] = fechas[0], fechas[-1]
+    dias, columnas = rng.integers(0, len(fechas), n_tx), rng.integers(0, n_tickers, n_tx)
+    tx = pd.DataFrame({
+        "fecha": (fechas[dias] + pd.Timedelta(hours=15)).tz_localize("UTC").astype(str),
+        "ticker": np.array(tickers)[columnas],
+        "tipo": rng.choice(["COMPRA", "COMPRA", "VENTA"], n_tx),
+        "cantidad": rng.uniform(0.1, 5, n_tx),
+        "precio_usd": precios[dias, columnas],
+        "precio_dolar_clp": rng.uniform(800, 1000, n_tx),
+    })
+    serie_fx = pd.Series(900 + np.cumsum(rng.normal(0, 2, len(fechas))), index=fechas, name="fx")
+    return datos, tx, serie_fx
+
+def verificar_cuotas(datos, tx):
+    # La posición final de matriz_cuotas debe coincidir con la de libro_mayor, incluso con ventas mayores a la posición.
+    # Una operación por ticker y día: en barras diarias las del mismo día se netean y el orden intradía se pierde
+    tx = tx.drop_duplicates(subset=["ticker", "fecha"]).reset_index(drop=True).assign(id=lambda d: d.index + 1)
+    fechas = next(iter(datos.values()))["full"].index
+    tickers = sorted(tx["ticker"].unique())
+    finales = matriz_cuotas(tx, fechas, tickers).iloc[-1]
+    posiciones, _ = calcular_libro_mayor(tx, 950.0)
+    distintas = [t for t in tickers if not np.isclose(finales[t], posiciones[t]["cuotas"])]
+    ejemplo = pd.DataFrame({"ticker": "A", "tipo": ["COMPRA", "VENTA", "COMPRA"], "cantidad": [1.0, 2.0, 1.0], "fecha": [str(f + pd.Timedelta(hours=15)) + "+00:00" for f in fechas[:3]]})
+    ejemplo_ok = matriz_cuotas(ejemplo, fechas[:3], ["A"])["A"].tolist() == [1.0, 0.0, 1.0]
+    # Una compra a las 21:00 de Nueva York ya es el día siguiente en UTC: debe contar para el cierre del día en Nueva York
+    noche = str((fechas[1] + pd.Timedelta(hours=21)).tz_localize("America/New_York").tz_convert("UTC"))
+    zona_ok = matriz_cuotas(pd.DataFrame({"ticker": ["A"], "tipo": ["COMPRA"], "cantidad": [1.0], "fecha": [noche]}), fechas[:3], ["A"])["A"].tolist() == [0.0, 1.0, 1.0]
+    print(f"cuotas finales vs libro_mayor: {len(distintas)} tickers distintos; compra 1, vende 2, compra 1: {'OK' if ejemplo_ok else 'DIFERENCIA'}; compra a las 21:00 de Nueva York: {'OK' if zona_ok else 'DIFERENCIA'}")
+    return len(distintas) + (not ejemplo_ok) + (not zona_ok)
+
+def main(n_tickers=100, anios=5, repeticiones=5):
+    datos, tx, serie_fx = generar(n_tickers, anios)
+    fallas = verificar_cuotas(datos, tx)
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        analisis = analizar_cartera(datos, tx, serie_fx)
+        tiempos.append(time.perf_counter() - t0)
+    print(f"analizar_cartera {n_tickers} tickers x {anios} años: mediana {np.median(tiempos) * 1000:.1f} ms (mín {min(tiempos) * 1000:.1f} ms)")
+    print({k: round(v, 4) for k, v in analisis["metricas"]["clp"].items()})
+    if fallas: sys.exit(f"{fallas} posiciones no coinciden con libro_mayor")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
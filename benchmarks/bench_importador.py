@@ -0,0 +1,53 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+from importador import validar_bloque
+
+# (texto en el CSV, fecha esperada en UTC); None = fila rechazada por fecha inválida
+FECHAS = [
+    ("2024-01-05", "2024-01-05T00:00:00+00:00"),
+    ("2024-03-01T10:00:00", "2024-03-01T10:00:00+00:00"),
+    ("2024-03-01 10:00:00-03:00", "2024-03-01T13:00:00+00:00"),
+    ("2024-01-13", "2024-01-13T00:00:00+00:00"),
+    ("2024/02/03", "2024-02-03T00:00:00+00:00"),
+    ("05/01/2024", "2024-01-05T00:00:00+00:00"),
+    ("13/01/2024", "2024-01-13T00:00:00+00:00"),
+    ("01-03-2024 14:30", "2024-03-01T14:30:00+00:00"),
+    ("no es fecha", None),
+]
+
+def generar(n_filas=5000, semilla=0):
+    # Mitad ISO, mitad DD/MM/AAAA: el mismo archivo mezcla ambos formatos
+    rng = np.random.default_rng(semilla)
+    fechas = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365, n_filas), unit="D")
+    iso = rng.random(n_filas) < 0.5
+    return pd.DataFrame({
+        "ticker": rng.choice(["AAPL", "MSFT", "SQM"], n_filas),
+        "tipo": rng.choice(["COMPRA", "VENTA"], n_filas),
+        "cantidad": rng.uniform(0.1, 5, n_filas).round(3).astype(str),
+        "precio": rng.uniform(10, 500, n_filas).round(2).astype(str),
+        "fecha": np.where(iso, fechas.strftime("%Y-%m-%d"), fechas.strftime("%d/%m/%Y")),
+    }), fechas.strftime("%Y-%m-%dT00:00:00+00:00")
+
+def main(n_filas=5000):
+    fallas = 0
+    casos = pd.DataFrame({"ticker": "AAPL", "tipo": "COMPRA", "cantidad": "1", "precio": "100", "fecha": [t for t, _ in FECHAS]})
+    filas, errores = validar_bloque(casos)
+    obtenidas = iter(f["fecha"] for f in filas)
+    rechazadas = {e["fila"] - 2 for e in errores}
+    for i, (texto, esperada) in enumerate(FECHAS):
+        obtenida = None if i in rechazadas else next(obtenidas)
+        fallas += obtenida != esperada
+        print(f"  {texto:28s} -> {obtenida}{'' if obtenida == esperada else f'  (esperada {esperada})'}")
+    bloque, esperadas = generar(n_filas)
+    t0 = time.perf_counter()
+    filas, _ = validar_bloque(bloque)
+    ms = (time.perf_counter() - t0) * 1000
+    distintas = sum(f["fecha"] != e for f, e in zip(filas, esperadas))
+    fallas += distintas + (len(filas) != n_filas)
+    print(f"validar_bloque {n_filas} filas (ISO y DD/MM/AAAA mezcladas): {ms:.1f} ms, {distintas} fechas distintas a las esperadas")
+    if fallas: sys.exit(f"{fallas} fechas no coinciden")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
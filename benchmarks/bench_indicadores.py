@@ -0,0 +1,58 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import indicadores
+
+def calcular_indicadores_original(df):
+    delta = df['Close'].diff()
+    up = delta.clip(lower=0)
+    down = -1 * delta.clip(upper=0)
+    ema_up = up.ewm(com=13, adjust=False).mean()
+    ema_down = down.ewm(com=13, adjust=False).mean()
+    rs = ema_up / ema_down
+    df['RSI'] = 100 - (100 / (1 + rs))
+    return df
+
+def generar(n_tickers=40, barras=1260, semilla=0):
+    rng = np.random.default_rng(semilla)
+    fechas = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=barras + 1)
+    cierres = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, (barras + 1, n_tickers)), axis=0))
+    return {f"T{i:03d}": pd.DataFrame({"Close": cierres[:, i]}, index=fechas) for i in range(n_tickers)}
+
+def medir(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return np.median(tiempos) * 1000
+
+def main(n_tickers=40, barras=1260):
+    completos = generar(n_tickers, barras)
+    previos = {t: h.iloc[:-1] for t, h in completos.items()}
+    original = medir(lambda: [calcular_indicadores_original(h.copy()) for h in completos.values()])
+    def en_frio():
+        indicadores._estados.clear()
+        return indicadores.rsi_actual(completos, "1d")
+    frio = medir(en_frio)
+    def incremental():
+        indicadores._estados.clear()
+        indicadores.rsi_actual(previos, "1d")
+        t0 = time.perf_counter()
+        indicadores.rsi_actual(completos, "1d")
+        return time.perf_counter() - t0
+    incremental_ms = np.median([incremental() for _ in range(5)]) * 1000
+    senales = medir(lambda: indicadores.calcular_senales(completos))
+    esperado = {t: calcular_indicadores_original(h.copy())['RSI'].iloc[-1] for t, h in completos.items()}
+    obtenido = indicadores.rsi_actual(completos, "1d")
+    error = max(abs(esperado[t] - obtenido[t]) for t in completos)
+    print(f"{n_tickers} tickers x {barras} barras")
+    print(f"  RSI original (pandas por ticker): {original:8.2f} ms")
+    print(f"  RSI motor en frío (matriz):       {frio:8.2f} ms")
+    print(f"  RSI motor con 1 barra nueva:      {incremental_ms:8.2f} ms")
+    print(f"  SMA/EMA/MACD/Bollinger (matriz):  {senales:8.2f} ms")
+    print(f"  diferencia máxima de RSI: {error:.2e}")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
@@ -0,0 +1,119 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+import diagnostico
+from libro_mayor import calcular_libro_mayor
+
+def libro_mayor_original(df_tx, dolar_hoy):
+    # Bucle de app.py antes de libro_mayor.py, sin cambios
+    mis_posiciones = {}
+    ganancia_realizada_total_clp = 0.0
+    df_tx = df_tx.copy()
+    if 'precio_dolar_clp' not in df_tx.columns: df_tx['precio_dolar_clp'] = dolar_hoy
+    for ticker in df_tx['ticker'].unique():
+        df_t = df_tx[df_tx['ticker'] == ticker].copy().sort_values('fecha')
+        lote_compras = []
+        gan_clp_ticker = 0.0
+        ultimo_precio_venta = 0.0
+        for _, row in df_t.iterrows():
+            cant = float(row['cantidad'])
+            precio = float(row['precio_usd'])
+            fx_tx = float(row['precio_dolar_clp']) if pd.notnull(row['precio_dolar_clp']) else dolar_hoy
+            if row['tipo'] == 'COMPRA':
+                lote_compras.append({'qty': cant, 'price': precio, 'fx': fx_tx})
+            elif row['tipo'] == 'VENTA':
+                ultimo_precio_venta = precio
+                cant_a_vender = cant
+                while cant_a_vender > 0 and lote_compras:
+                    compra_antigua = lote_compras[0]
+                    qty_vendida = min(compra_antigua['qty'], cant_a_vender)
+                    gan_clp_ticker += (qty_vendida * precio * fx_tx) - (qty_vendida * compra_antigua['price'] * compra_antigua['fx'])
+                    if compra_antigua['qty'] <= cant_a_vender:
+                        cant_a_vender -= qty_vendida
+                        lote_compras.pop(0)
+                    else:
+                        compra_antigua['qty'] -= qty_vendida
+                        cant_a_vender = 0
+        cuotas_restantes = sum(l['qty'] for l in lote_compras)
+        costo_total_usd = sum(l['qty'] * l['price'] for l in lote_compras)
+        costo_total_clp = sum(l['qty'] * l['price'] * l['fx'] for l in lote_compras)
+        mis_posiciones[ticker] = {
+            'cuotas': cuotas_restantes,
+            'precio_medio_usd': costo_total_usd / cuotas_restantes if cuotas_restantes > 0 else 0.0,
+            'costo_total_clp': costo_total_clp,
+            'ultimo_precio_venta': ultimo_precio_venta
+        }
+        ganancia_realizada_total_clp += gan_clp_ticker
+    return mis_posiciones, ganancia_realizada_total_clp
+
+def generar(n_tx=2000, n_tickers=20, sin_fx=0.1, semilla=0):
+    # Fechas distintas por fila: el bucle original ordena con quicksort y en empates el orden no está definido
+    rng = np.random.default_rng(semilla)
+    segundos = np.sort(rng.choice(5 * 365 * 86400, n_tx, replace=False))
+    fechas = pd.Timestamp("2020-01-01", tz="UTC") + pd.to_timedelta(segundos, unit="s")
+    fx = rng.uniform(800, 1000, n_tx)
+    return pd.DataFrame({
+        "id": np.arange(1, n_tx + 1),
+        "fecha": fechas.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+        "ticker": np.array([f"T{i:03d}" for i in range(n_tickers)])[rng.integers(0, n_tickers, n_tx)],
+        "tipo": rng.choice(["COMPRA", "COMPRA", "VENTA"], n_tx),
+        "cantidad": rng.uniform(0.1, 5, n_tx),
+        "precio_usd": rng.uniform(10, 500, n_tx),
+        "precio_dolar_clp": np.where(rng.random(n_tx) < sin_fx, None, fx),
+    })
+
+def casos(df, fx):
+    # (nombre, filas del snapshot, filas de la corrida, dólar de respaldo, generación de la corrida, se espera usar el snapshot).
+    # Las filas nuevas llevan id mayor, como las inserta Supabase; editar en Supabase sube la generación en database.py
+    siguiente = int(df['id'].max()) + 1
+    ultima = df.iloc[-1]
+    misma_marca = pd.DataFrame([dict(ultima, id=siguiente, ticker=df['ticker'][df['ticker'] != ultima['ticker']].iloc[0], tipo="VENTA", cantidad=1.5)])
+    medio = df.iloc[len(df) // 2]
+    retroactiva = pd.DataFrame([dict(medio, id=siguiente, fecha=(pd.Timestamp(medio['fecha']) + pd.Timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%S+00:00"), tipo="COMPRA", cantidad=2.0)])
+    editada = df.copy()
+    editada.loc[10, "cantidad"] += 1.0
+    return [
+        ("mismas filas", df, df, fx, 0, True),
+        ("20 filas nuevas", df.iloc[:-20], df, fx, 0, True),
+        ("fila con la fecha de la marca", df, pd.concat([df, misma_marca], ignore_index=True), fx, 0, True),
+        ("fila retroactiva", df, pd.concat([df, retroactiva], ignore_index=True), fx, 0, False),
+        ("fila editada (nueva generación)", df, editada, fx, 1, False),
+        ("fila borrada", df, df.drop(index=10).reset_index(drop=True), fx, 0, False),
+        ("otro dólar de respaldo", df, df, fx + 10.0, 0, False),
+    ]
+
+def version(df, generacion=0):
+    return (generacion, len(df), int(df['id'].max()))
+
+def main(n_tx=2000, n_tickers=20):
+    df, fx = generar(n_tx, n_tickers), 950.0
+    fallas = 0
+    t0 = time.perf_counter()
+    esperado = libro_mayor_original(df, fx)
+    original_ms = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    obtenido = calcular_libro_mayor(df, fx)
+    frio_ms = (time.perf_counter() - t0) * 1000
+    calcular_libro_mayor(df.iloc[:-1], fx, version=version(df.iloc[:-1]))
+    t0 = time.perf_counter()
+    calcular_libro_mayor(df, fx, version=version(df))
+    una_fila_ms = (time.perf_counter() - t0) * 1000
+    print(f"{n_tx} transacciones x {n_tickers} tickers")
+    print(f"  bucle original (iterrows):  {original_ms:8.2f} ms")
+    print(f"  libro_mayor en frío:        {frio_ms:8.2f} ms")
+    print(f"  libro_mayor con 1 fila nueva: {una_fila_ms:6.2f} ms")
+    print(f"  {'en frío':34s} {'OK' if obtenido == esperado else 'DIFERENCIA'}")
+    fallas += obtenido != esperado
+    for nombre, base, nuevo, fx_corrida, generacion, con_snapshot in casos(df, fx):
+        calcular_libro_mayor(base, fx, version=version(base))
+        corrida = diagnostico.iniciar_corrida("bench")
+        obtenido = calcular_libro_mayor(nuevo, fx_corrida, version=version(nuevo, generacion))
+        uso = corrida["contadores"][("libro_mayor.snapshot", "acierto")] > 0
+        iguales = obtenido == libro_mayor_original(nuevo, fx_corrida)
+        fallas += not iguales or uso != con_snapshot
+        print(f"  {nombre:34s} {'OK' if iguales else 'DIFERENCIA'}, snapshot {'usado' if uso else 'descartado'}{'' if uso == con_snapshot else ' (inesperado)'}")
+    if fallas: sys.exit(f"{fallas} casos no coinciden con el bucle original")
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:]))
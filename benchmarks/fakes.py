@@ -0,0 +1,164 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+import requests
+import streamlit
+import supabase as modulo_supabase
+import yfinance
+import almacen
+from benchmarks import sinteticos
+
+LATENCIAS = {"history": 0.0, "info": 0.0, "busqueda": 0.0, "supabase": 0.0}
+ZONA_YAHOO = "America/New_York"
+PERIODOS_GRABACION = {"1d": "5y", "15m": "1mo", "5m": "5d"}
+
+class Fixtures:
+    # Series grabadas en disco (ver grabar) y, para lo que no esté grabado, series sintéticas deterministas
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _archivo(self, ticker, sufijo):
+        return os.path.join(self.ruta, f"{ticker.replace('=', '_')}_{sufijo}") if self.ruta else None
+
+    def historial(self, ticker, intervalo):
+        with self._lock: hist = self._series.get((ticker, intervalo))
+        if hist is None:
+            archivo = self._archivo(ticker, f"{intervalo}.csv")
+            if archivo and os.path.exists(archivo): hist = pd.read_csv(archivo, index_col=0, parse_dates=True)
+            else: hist = sinteticos.ohlcv(ticker, intervalo, barras=2 * sinteticos.BARRAS_DIARIAS if intervalo == "1d" else None, nivel=900.0 if ticker.endswith("=X") else 100.0)
+            with self._lock: self._series[(ticker, intervalo)] = hist
+        return hist
+
+    def info(self, ticker):
+        archivo = self._archivo(ticker, "info.json")
+        if archivo and os.path.exists(archivo):
+            with open(archivo) as f: return json.load(f)
+        margen = (sinteticos.semilla(ticker, "margen") % 60 - 10) / 100
+        return {"trailingPE": 5.0 + sinteticos.semilla(ticker, "pe") % 60, "profitMargins": margen, "quoteType": "EQUITY"}
+
+    def busqueda(self, texto):
+        return {"quotes": [{"symbol": texto.upper(), "shortname": f"Empresa {texto.upper()}"}]}
+
+def _esperar(servicio, latencias):
+    if latencias.get(servicio): time.sleep(latencias[servicio])
+
+class TickerFalso:
+    def __init__(self, ticker, fixtures, latencias):
+        self.ticker, self.fixtures, self.latencias = ticker, fixtures, latencias
+
+    def history(self, period=None, interval="1d", start=None, timeout=None, **_):
+        _esperar("history", self.latencias)
+        hist = self.fixtures.historial(self.ticker, interval)
+        if start is not None: hist = hist[hist.index >= pd.Timestamp(start)]
+        elif period is not None:
+            if period.endswith("d"):
+                dias = hist.index.normalize().unique()[-int(period[:-1]):]
+                hist = hist[hist.index.normalize().isin(dias)]
+            else: hist = hist[hist.index >= almacen.inicio_periodo(period)]
+        hist = hist.copy()
+        hist.index = hist.index.tz_localize(ZONA_YAHOO)
+        return hist
+
+    @property
+    def info(self):
+        _esperar("info", self.latencias)
+        return self.fixtures.info(self.ticker)
+
+class RespuestaFalsa:
+    def __init__(self, datos): self.datos = datos
+    def json(self): return self.datos
+
+class ResultadoFalso:
+    def __init__(self, data, count=None): self.data, self.count = data, count
+
+class ConsultaFalsa:
+    # Cubre lo que usa database.py: select/order/limit/gt/eq, insert/upsert y delete
+    def __init__(self, cliente, tabla):
+        self.cliente, self.tabla, self.filtros, self.orden, self.limite, self.accion, self.carga = cliente, tabla, [], None, None, "select", None
+        self.conteo, self.solo_conteo = None, False
+
+    def select(self, columnas, count=None, head=False): self.conteo, self.solo_conteo = count, head; return self
+    def order(self, columna): self.orden = columna; return self
+    def limit(self, n): self.limite = n; return self
+    def gt(self, columna, valor): self.filtros.append(lambda f: f.get(columna) is not None and f[columna] > valor); return self
+    def eq(self, columna, valor): self.filtros.append(lambda f: f.get(columna) == valor); return self
+    def insert(self, carga): self.accion, self.carga = "insert", carga; return self
+    def upsert(self, carga): self.accion, self.carga = "upsert", carga; return self
+    def delete(self): self.accion = "delete"; return self
+
+    def execute(self):
+        _esperar("supabase", self.cliente.latencias)
+        with self.cliente.lock:
+            filas = self.cliente.tablas.setdefault(self.tabla, [])
+            if self.accion in ("insert", "upsert"): return ResultadoFalso(self.cliente.escribir(self.tabla, self.carga if isinstance(self.carga, list) else [self.carga], self.accion == "upsert"))
+            elegidas = [f for f in filas if all(filtro(f) for filtro in self.filtros)]
+            if self.accion == "delete":
+                self.cliente.tablas[self.tabla] = [f for f in filas if f not in elegidas]
+                return ResultadoFalso(elegidas)
+            if self.orden: elegidas.sort(key=lambda f: f[self.orden])
+            return ResultadoFalso([] if self.solo_conteo else [dict(f) for f in elegidas[:self.limite]], len(elegidas) if self.conteo else None)
+
+class SupabaseFalso:
+    CLAVES = {"transacciones": "id", "watchlist": "ticker", "configuracion": "id"}
+
+    def __init__(self, tablas=None, latencias=None):
+        self.tablas = {k: [dict(f) for f in v] for k, v in (tablas or {}).items()}
+        self.latencias = LATENCIAS if latencias is None else latencias
+        self.lock = threading.Lock()
+
+    def table(self, nombre): return ConsultaFalsa(self, nombre)
+
+    def escribir(self, tabla, filas, reemplazar):
+        actuales, clave, escritas = self.tablas.setdefault(tabla, []), self.CLAVES.get(tabla, "id"), []
+        for fila in filas:
+            fila = dict(fila)
+            if tabla == "transacciones" and "id" not in fila:
+                fila["id"] = max((f["id"] for f in actuales), default=0) + 1
+                fila.setdefault("fecha", pd.Timestamp.now(tz="UTC").isoformat())
+            if reemplazar: actuales[:] = [f for f in actuales if f.get(clave) != fila.get(clave)]
+            actuales.append(fila)
+            escritas.append(dict(fila))
+        return escritas
+
+@contextmanager
+def instalar(fixtures=None, latencias=None, tablas=None, ruta_almacen=None):
+    # Reemplaza yfinance, requests y Supabase por dobles locales mientras dure el bloque
+    fixtures = fixtures or Fixtures()
+    latencias = dict(LATENCIAS, **(latencias or {}))
+    cliente = SupabaseFalso(tablas, latencias)
+    def busqueda(sesion, url, params=None, **_):
+        _esperar("busqueda", latencias)
+        return RespuestaFalsa(fixtures.busqueda(params["q"]))
+    originales = [(yfinance, "Ticker", yfinance.Ticker), (requests.Session, "get", requests.Session.get), (modulo_supabase, "create_client", modulo_supabase.create_client), (streamlit, "secrets", streamlit.secrets), (almacen, "RUTA_ALMACEN", almacen.RUTA_ALMACEN)]
+    yfinance.Ticker = lambda ticker, *a, **k: TickerFalso(ticker, fixtures, latencias)
+    requests.Session.get = busqueda
+    modulo_supabase.create_client = lambda *a, **k: cliente
+    streamlit.secrets = {"SUPABASE_URL": "http://supabase.local", "SUPABASE_KEY": "falsa"}
+    if ruta_almacen: almacen.RUTA_ALMACEN = ruta_almacen
+    if "database" in sys.modules: sys.modules["database"].supabase = cliente
+    try: yield cliente
+    finally:
+        for objeto, atributo, valor in originales: setattr(objeto, atributo, valor)
+
+def grabar(ruta, tickers, periodos=PERIODOS_GRABACION):
+    # Graba respuestas reales de Yahoo para reproducirlas después sin red (hora local de cada bolsa)
+    os.makedirs(ruta, exist_ok=True)
+    fixtures = Fixtures(ruta)
+    for ticker in tickers:
+        for intervalo, periodo in periodos.items():
+            hist = yfinance.Ticker(ticker).history(period=periodo, interval=intervalo)
+            if hist.empty: continue
+            if hist.index.tz is not None: hist.index = hist.index.tz_localize(None)
+            hist.to_csv(fixtures._archivo(ticker, f"{intervalo}.csv"))
+        info = {k: v for k, v in (yfinance.Ticker(ticker).info or {}).items() if k in ("trailingPE", "forwardPE", "profitMargins", "quoteType")}
+        with open(fixtures._archivo(ticker, "info.json"), "w") as f: json.dump(info, f)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3: sys.exit("uso: python -m benchmarks.fakes RUTA TICKER [TICKER ...]")
+    grabar(sys.argv[1], sys.argv[2:])
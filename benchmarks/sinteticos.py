@@ -0,0 +1,85 @@
+import zlib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+BARRAS_DIARIAS = 1260
+SESIONES_INTRADIA = 30
+HORARIO = (9.5, 16.0)
+# Los tickers sintéticos no tienen sufijo: cotizan en Nueva York, como en calendario.ZONAS
+ZONA = "America/New_York"
+
+def semilla(*partes):
+    # Estable entre procesos (a diferencia de hash()): el mismo ticker genera siempre la misma serie
+    return zlib.crc32("|".join(map(str, partes)).encode())
+
+def nombres_tickers(n):
+    return [f"T{i:03d}" for i in range(n)]
+
+def indice(intervalo="1d", barras=None, fin=None):
+    # bdate_range es lento: todos los tickers comparten el mismo calendario
+    return _indice(intervalo, barras, pd.Timestamp(fin or pd.Timestamp.today()).normalize())
+
+@lru_cache(maxsize=32)
+def _indice(intervalo, barras, fin):
+    if intervalo == "1d":
+        return pd.bdate_range(end=fin, periods=barras or BARRAS_DIARIAS, name="Date")
+    paso = pd.Timedelta(intervalo.replace("m", "min"))
+    dias = pd.bdate_range(end=fin, periods=barras or SESIONES_INTRADIA)
+    apertura, cierre = pd.Timedelta(hours=HORARIO[0]), pd.Timedelta(hours=HORARIO[1])
+    return pd.DatetimeIndex(np.concatenate([pd.date_range(d + apertura, d + cierre - paso, freq=paso).values for d in dias]), name="Datetime")
+
+def ohlcv(ticker, intervalo="1d", barras=None, fin=None, nivel=100.0):
+    fechas = indice(intervalo, barras, fin)
+    rng = np.random.default_rng(semilla(ticker, intervalo))
+    volatilidad = 0.015 if intervalo == "1d" else 0.002
+    cierre = nivel * np.exp(np.cumsum(rng.normal(0, volatilidad, len(fechas))))
+    apertura = cierre * (1 + rng.normal(0, volatilidad / 4, len(fechas)))
+    holgura = np.abs(rng.normal(0, volatilidad / 2, len(fechas)))
+    return pd.DataFrame({
+        "Open": apertura,
+        "High": np.maximum(apertura, cierre) * (1 + holgura),
+        "Low": np.minimum(apertura, cierre) * (1 - holgura),
+        "Close": cierre,
+        "Volume": rng.integers(1_000, 1_000_000, len(fechas)).astype(float),
+        "Dividends": 0.0,
+        "Stock Splits": 0.0,
+    }, index=fechas)
+
+def historiales(tickers, intervalo="1d", barras=None, fin=None):
+    return {t: ohlcv(t, intervalo, barras, fin) for t in tickers}
+
+def serie_fx(barras=BARRAS_DIARIAS, fin=None):
+    fechas = indice("1d", barras, fin)
+    rng = np.random.default_rng(semilla("CLP=X"))
+    return pd.Series(900 + np.cumsum(rng.normal(0, 2, len(fechas))), index=fechas, name="fx")
+
+def transacciones(n_filas, tickers, precios=None, sin_fx=0.1, semilla_tx=0):
+    # Filas con la forma de la tabla de Supabase; los precios salen del mercado sintético para que las métricas tengan sentido
+    rng = np.random.default_rng(semilla_tx)
+    precios = precios or historiales(tickers)
+    columnas = rng.integers(0, len(tickers), n_filas)
+    largos = np.array([len(precios[t]) for t in tickers])
+    posiciones = (rng.random(n_filas) * largos[columnas]).astype(int)
+    fechas, precio_usd = np.empty(n_filas, dtype="datetime64[ns]"), np.empty(n_filas)
+    for j, t in enumerate(tickers):
+        elegidas = columnas == j
+        fechas[elegidas] = precios[t].index.values[posiciones[elegidas]]
+        precio_usd[elegidas] = precios[t]['Close'].to_numpy()[posiciones[elegidas]]
+    fechas = pd.DatetimeIndex(fechas)
+    # Las barras diarias no tienen hora: la operación se marca a las 15:00 de Nueva York.
+    # Las barras están en hora local y Supabase guarda UTC
+    fechas = fechas + pd.to_timedelta(np.where(fechas == fechas.normalize(), 15, 0), unit="h")
+    fechas = fechas.tz_localize(ZONA).tz_convert("UTC")
+    fx = rng.uniform(800, 1000, n_filas)
+    df = pd.DataFrame({
+        "fecha": fechas.strftime("%Y-%m-%dT%H:%M:%S+00:00"),
+        "ticker": np.array(tickers)[columnas],
+        "tipo": np.where(rng.random(n_filas) < 1 / 3, "VENTA", "COMPRA"),
+        "cantidad": rng.uniform(0.1, 5, n_filas),
+        "precio_usd": precio_usd,
+        "precio_dolar_clp": np.where(rng.random(n_filas) < sin_fx, np.nan, fx),
+    }).sort_values("fecha", kind="stable", ignore_index=True)
+    df.insert(0, "id", np.arange(1, n_filas + 1))
+    filas = df.astype(object).where(df.notna(), None).to_dict("records")
+    return filas
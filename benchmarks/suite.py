@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import almacen
+import analitica
+import calendario
+import fundamentales
+import graficos
+import indicadores
+from benchmarks import fakes, sinteticos
+from divisas import completar_fx_transacciones, dolar_actual
+from libro_mayor import calcular_libro_mayor
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_HISTORIAL = os.path.join(RAIZ, ".cache", "benchmarks.jsonl")
+ESCALAS = {"chica": (10, 1), "media": (5_000, 50), "grande": (100_000, 500)}
+UMBRAL_REGRESION = 0.10
+
+def cronometrar(funcion, repeticiones, preparar=None):
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar: preparar()
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - t0)
+    return float(np.median(tiempos)) * 1000, min(tiempos) * 1000
+
+def armar_datos(historiales, dias_vista=365):
+    # Misma forma que armar_datos_portafolio en app.py
+    datos = {}
+    for ticker, hist in historiales.items():
+        fin = hist.index[-1]
+        inicio = fin - pd.Timedelta(days=dias_vista)
+        datos[ticker] = {"full": hist, "vista": hist[hist.index >= inicio], "inicio": inicio, "fin": fin}
+    return datos
+
+def preparar_carga(escala):
+    n_filas, n_tickers = ESCALAS[escala]
+    tickers = sinteticos.nombres_tickers(n_tickers)
+    historiales = sinteticos.historiales(tickers)
+    filas = sinteticos.transacciones(n_filas, tickers, historiales)
+    serie_fx = sinteticos.serie_fx()
+    df_tx = completar_fx_transacciones(pd.DataFrame(filas), serie_fx, dolar_actual(serie_fx))
+    return {"tickers": tickers, "historiales": historiales, "intradia": sinteticos.historiales(tickers, "15m"), "filas": filas, "df_tx": df_tx, "serie_fx": serie_fx, "datos": armar_datos(historiales)}
+
+def libro_mayor_frio(carga, repeticiones, tmp, latencias):
+    return cronometrar(lambda: calcular_libro_mayor(carga["df_tx"], 950.0), repeticiones)
+
+def libro_mayor_snapshot(carga, repeticiones, tmp, latencias):
+    # Snapshot con todas las filas menos la última: el caso de registrar una transacción
+    df, base = carga["df_tx"], carga["df_tx"].iloc[:-1]
+    def preparar(): calcular_libro_mayor(base, 950.0, version=(0, len(base), base['id'].max()))
+    return cronometrar(lambda: calcular_libro_mayor(df, 950.0, version=(0, len(df), df['id'].max())), repeticiones, preparar)
+
+def rsi_frio(carga, repeticiones, tmp, latencias):
+    return cronometrar(lambda: indicadores.rsi_actual(carga["historiales"], "1d"), repeticiones, indicadores._estados.clear)
+
+def rsi_una_barra(carga, repeticiones, tmp, latencias):
+    previos = {t: h.iloc[:-1] for t, h in carga["historiales"].items()}
+    def preparar():
+        indicadores._estados.clear()
+        indicadores.rsi_actual(previos, "1d")
+    return cronometrar(lambda: indicadores.rsi_actual(carga["historiales"], "1d"), repeticiones, preparar)
+
+def senales(carga, repeticiones, tmp, latencias):
+    return cronometrar(lambda: indicadores.calcular_senales(carga["historiales"]), repeticiones)
+
+def cortes_diario(carga, repeticiones, tmp, latencias):
+    return cronometrar(lambda: calendario.cortes_eje_x(carga["historiales"], "1d"), repeticiones, calendario._calendarios.clear)
+
+def cortes_intradia(carga, repeticiones, tmp, latencias):
+    return cronometrar(lambda: calendario.cortes_eje_x(carga["intradia"], "15m"), repeticiones, calendario._calendarios.clear)
+
+def resumen_clp(carga, repeticiones, tmp, latencias):
+    posiciones, ganancia = calcular_libro_mayor(carga["df_tx"], 950.0)
+    precios = {t: d["vista"]['Close'].iloc[-1] for t, d in carga["datos"].items()}
+    def calcular():
+        analitica.curva_patrimonio(carga["datos"], carga["df_tx"], carga["serie_fx"])
+        analitica.resumen_clp(posiciones, precios, ganancia, dolar_actual(carga["serie_fx"]), 8.0)
+    return cronometrar(calcular, repeticiones)
+
+def construccion_graficos(carga, repeticiones, tmp, latencias):
+    # Serie global + una tarjeta por ticker, serializadas como las envía st.plotly_chart
+    datos, cortes = carga["datos"], calendario.cortes_eje_x(carga["historiales"], "1d")
+    inicio, fin = next(iter(datos.values()))["inicio"], next(iter(datos.values()))["fin"]
+    def construir():
+        trazas, y_min, y_max = graficos.trazas_rendimiento(datos, list(datos), inicio, fin)
+        for ticker, d in datos.items():
+            graficos.figura_tarjeta(graficos.reducir(d["vista"]['Close'], graficos.PUNTOS_TARJETA), "#34c759", d["vista"]['Close'].iloc[0], cortes).to_json()
+    return cronometrar(construir, repeticiones)
+
+def red_historiales(carga, repeticiones, tmp, latencias):
+    # Almacén vacío: descarga completa de 5 años por ticker contra el Yahoo falso
+    ruta = os.path.join(tmp, "ohlcv.sqlite")
+    def limpiar():
+        for sufijo in ("", "-wal", "-shm"):
+            if os.path.exists(ruta + sufijo): os.remove(ruta + sufijo)
+    with fakes.instalar(latencias=latencias, ruta_almacen=ruta):
+        return cronometrar(lambda: almacen.obtener_historiales(carga["tickers"], "5y", "1d"), repeticiones, limpiar)
+
+def red_transacciones(carga, repeticiones, tmp, latencias):
+    with fakes.instalar(latencias=latencias, tablas={"transacciones": carga["filas"]}, ruta_almacen=os.path.join(tmp, "ohlcv.sqlite")):
+        # database crea el cliente de Supabase al importarse: tiene que ser con los dobles instalados
+        import database
+        return cronometrar(database.obtener_transacciones, repeticiones, database.recargar_transacciones)
+
+def red_fundamentales(carga, repeticiones, tmp, latencias):
+    with fakes.instalar(latencias=latencias, ruta_almacen=os.path.join(tmp, "ohlcv.sqlite")):
+        return cronometrar(lambda: fundamentales.prefetch(carga["tickers"], forzar=True), repeticiones)
+
+ESCENARIOS = {
+    "libro_mayor.frio": libro_mayor_frio,
+    "libro_mayor.snapshot": libro_mayor_snapshot,
+    "indicadores.rsi_frio": rsi_frio,
+    "indicadores.rsi_1_barra": rsi_una_barra,
+    "indicadores.senales": senales,
+    "cortes_eje_x.diario": cortes_diario,
+    "cortes_eje_x.15m": cortes_intradia,
+    "resumen_clp": resumen_clp,
+    "graficos.construccion": construccion_graficos,
+    "red.historiales": red_historiales,
+    "red.transacciones": red_transacciones,
+    "red.fundamentales": red_fundamentales,
+}
+
+def commit_actual():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+        sucio = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ, capture_output=True, text=True).stdout.strip()
+        return commit + ("*" if sucio else "")
+    except (OSError, subprocess.CalledProcessError): return "sin-git"
+
+def ejecutar(escalas, filtro=None, repeticiones=5, latencia=0.0):
+    commit, resultados = commit_actual(), []
+    elegidos = {n: f for n, f in ESCENARIOS.items() if not filtro or any(n.startswith(p) for p in filtro)}
+    for escala in escalas:
+        carga = preparar_carga(escala)
+        for nombre, escenario in elegidos.items():
+            with tempfile.TemporaryDirectory() as tmp:
+                mediana, minimo = escenario(carga, repeticiones, tmp, {k: latencia for k in fakes.LATENCIAS})
+            resultados.append({"commit": commit, "fecha": time.strftime("%Y-%m-%d %H:%M:%S"), "escala": escala, "escenario": nombre, "mediana_ms": mediana, "min_ms": minimo, "repeticiones": repeticiones, "latencia": latencia})
+            print(f"  {escala:6s} {nombre:26s} {mediana:10.2f} ms")
+    return resultados
+
+def guardar(resultados, ruta=RUTA_HISTORIAL):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "a") as f:
+        for r in resultados: f.write(json.dumps(r) + "\n")
+
+def leer(ruta=RUTA_HISTORIAL):
+    if not os.path.exists(ruta): return pd.DataFrame()
+    with open(ruta) as f: return pd.DataFrame([json.loads(l) for l in f if l.strip()])
+
+def comparar(historial, n_commits=5, latencia=0.0, umbral=UMBRAL_REGRESION):
+    # Una columna por commit (la última corrida de cada uno) y la variación del último contra el anterior
+    if not historial.empty: historial = historial[historial["latencia"] == latencia]
+    if historial.empty: return pd.DataFrame()
+    commits = list(dict.fromkeys(historial["commit"]))[-n_commits:]
+    ultimos = historial[historial["commit"].isin(commits)].drop_duplicates(["commit", "escala", "escenario"], keep="last")
+    tabla = ultimos.pivot(index=["escala", "escenario"], columns="commit", values="mediana_ms").reindex(columns=commits)
+    if len(commits) > 1:
+        variacion = tabla[commits[-1]] / tabla[commits[-2]] - 1
+        tabla["Δ%"] = (variacion * 100).round(1)
+        tabla["alerta"] = np.where(variacion > umbral, "⚠️ regresión", np.where(variacion < -umbral, "✅ mejora", ""))
+    orden = {e: i for i, e in enumerate(ESCALAS)}
+    return tabla.reindex(sorted(tabla.index, key=lambda clave: (orden.get(clave[0], len(orden)), clave[1])))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sin red del dashboard con carteras sintéticas.")
+    parser.add_argument("--escalas", default="chica,media", help=f"separadas por coma: {', '.join(ESCALAS)}")
+    parser.add_argument("--escenarios", default="", help="prefijos separados por coma (ej: libro_mayor,red)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por llamada a Yahoo/Supabase falsos")
+    parser.add_argument("--historial", default=RUTA_HISTORIAL)
+    parser.add_argument("--commits", type=int, default=5, help="commits a mostrar en la comparación")
+    parser.add_argument("--sin-guardar", action="store_true")
+    args = parser.parse_args()
+    resultados = ejecutar(args.escalas.split(","), [p for p in args.escenarios.split(",") if p], args.repeticiones, args.latencia)
+    historial = leer(args.historial)
+    if not args.sin_guardar:
+        guardar(resultados, args.historial)
+        historial = leer(args.historial)
+    else:
+        historial = pd.concat([historial, pd.DataFrame(resultados)], ignore_index=True)
+    print()
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.float_format", "{:,.2f}".format):
+        print(comparar(historial, args.commits, args.latencia))
+
+if __name__ == "__main__":
+    main()
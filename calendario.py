@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from diagnostico import contar
+
+MAX_CALENDARIOS = 32
+INTRADIA = {"5m": 5, "15m": 15}
+# Horario continuo en hora local de cada bolsa; solo se usa cuando los datos no alcanzan para deducirlo
+SESIONES = {"": (9.5, 16.0), ".SN": (9.5, 16.0), ".TO": (9.5, 16.0), ".L": (8.0, 16.5)}
+# Zona de cada bolsa: Yahoo entrega las barras en esa hora local y precios._limpiar le quita la zona.
+# Las divisas (CLP=X) cotizan en la bolsa CCY de Yahoo, con barras diarias a medianoche de Londres
+ZONAS = {"": "America/New_York", ".SN": "America/Santiago", ".TO": "America/Toronto", ".L": "Europe/London", "=X": "Europe/London"}
+
+_lock = threading.Lock()
+_calendarios = OrderedDict()
+
+def _sufijo(ticker):
+    if ticker.endswith("=X"): return "=X"
+    return "." + ticker.rsplit(".", 1)[1] if "." in ticker else ""
+
+def sesion_tabla(ticker):
+    return SESIONES.get(_sufijo(ticker), SESIONES[""])
+
+def zona_horaria(ticker):
+    return ZONAS.get(_sufijo(ticker), ZONAS[""])
+
+def _marcas(historiales):
+    # Todas las barras de todos los tickers en un solo arreglo
+    if not historiales: return np.array([], dtype="datetime64[ns]")
+    return np.concatenate([h.index.to_numpy(dtype="datetime64[ns]") for h in historiales.values()])
+
+def dias_habiles(historiales, marcas=None):
+    # Una sola pasada: fechas concatenadas, truncadas al día y deduplicadas
+    dias = (_marcas(historiales) if marcas is None else marcas).astype("datetime64[D]")
+    return pd.DatetimeIndex(np.sort(pd.unique(dias)).astype("datetime64[ns]"))
+
+def feriados(dias):
+    # Días de semana sin ninguna barra dentro del rango observado, agrupados en tramos contiguos
+    if len(dias) < 2: return []
+    rango = pd.date_range(dias[0], dias[-1], freq="D")
+    faltantes = rango[~rango.isin(dias)]
+    faltantes = faltantes[faltantes.dayofweek < 5]
+    if faltantes.empty: return []
+    # Un tramo sigue mientras el siguiente día faltante llega saltando solo fines de semana
+    saltos = np.diff(faltantes.to_numpy(dtype="datetime64[D]").astype(np.int64))
+    continua = (saltos == 1) | ((saltos == 3) & (faltantes.dayofweek[:-1] == 4))
+    quiebres = np.flatnonzero(~continua)
+    inicios, fines = np.r_[0, quiebres + 1], np.r_[quiebres, len(faltantes) - 1]
+    return [(faltantes[i], faltantes[j]) for i, j in zip(inicios, fines)]
+
+def sesion(historiales, intervalo, marcas=None):
+    # Apertura y cierre (horas locales) que cubren a todos los tickers, deducidos de las barras;
+    # un ticker con un solo día de datos puede no mostrar la sesión completa y se completa con la tabla por sufijo
+    marcas = _marcas(historiales) if marcas is None else marcas
+    if not len(marcas): return SESIONES[""]
+    dias = marcas.astype("datetime64[D]")
+    minutos = (marcas - dias).astype("timedelta64[m]").astype(np.int64)
+    apertura, cierre = minutos.min() / 60, minutos.max() / 60 + INTRADIA[intervalo] / 60
+    largos = np.array([len(h) for h in historiales.values()])
+    fines = np.cumsum(largos)
+    un_dia = dias[fines - largos] == dias[fines - 1]
+    for ticker in np.array(list(historiales), dtype=object)[un_dia]:
+        tabla = sesion_tabla(ticker)
+        apertura, cierre = min(apertura, tabla[0]), max(cierre, tabla[1])
+    return float(apertura), float(min(cierre, 24.0))
+
+def _construir(historiales, intervalo):
+    marcas = _marcas(historiales)
+    cortes = [dict(bounds=["sat", "mon"])]
+    if intervalo in INTRADIA:
+        apertura, cierre = sesion(historiales, intervalo, marcas)
+        if cierre - apertura < 24: cortes.append(dict(bounds=[cierre, apertura], pattern="hour"))
+    for inicio, fin in feriados(dias_habiles(historiales, marcas)):
+        cortes.append(dict(bounds=[inicio.strftime("%Y-%m-%d"), (fin + pd.Timedelta(days=1)).strftime("%Y-%m-%d")]))
+    return cortes
+
+def cortes_eje_x(historiales, intervalo, periodo=None):
+    # Cacheado por (tickers, intervalo, período); la firma detecta barras nuevas sin recorrer las series
+    historiales = {t: h for t, h in historiales.items() if not h.empty}
+    clave = (tuple(sorted(historiales)), intervalo, periodo)
+    firma = tuple((len(historiales[t]), historiales[t].index[0], historiales[t].index[-1]) for t in clave[0])
+    with _lock:
+        guardado = _calendarios.get(clave)
+        if guardado is not None and guardado[0] == firma:
+            _calendarios.move_to_end(clave)
+            contar("calendario", "acierto")
+            return guardado[1]
+    contar("calendario", "fallo")
+    cortes = _construir(historiales, intervalo)
+    with _lock:
+        _calendarios[clave] = (firma, cortes)
+        while len(_calendarios) > MAX_CALENDARIOS: _calendarios.popitem(last=False)
+    return cortes
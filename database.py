@@ -1,5 +1,8 @@
+import time
+import threading
 import streamlit as st
 from supabase import create_client, Client
+from diagnostico import medir, contar
 
 @st.cache_resource
 def init_connection():
@@ -7,33 +10,139 @@ def init_connection():
 
 supabase = init_connection()
 
+COLUMNAS_TX = "id,fecha,ticker,tipo,cantidad,precio_usd,precio_dolar_clp"
+TAM_PAGINA = 1000
+TTL_TRANSACCIONES = 300
+TTL_RECARGA_COMPLETA = 1800
+
+# Estado de módulo como en refresco, no st.cache_resource: también lo lee y actualiza el hilo de fondo
+_transacciones = {"filas": [], "ids": set(), "ultimo_id": None, "vigente": False, "leido": 0.0, "completo": 0.0, "generacion": 0, "lock": threading.Lock()}
+
+def _cache_transacciones():
+    return _transacciones
+
+def obtener_transacciones_nuevas(desde_id=None):
+    filas = []
+    while True:
+        consulta = supabase.table("transacciones").select(COLUMNAS_TX).order("id").limit(TAM_PAGINA)
+        if desde_id is not None: consulta = consulta.gt("id", desde_id)
+        with medir("supabase.transacciones"): pagina = consulta.execute().data
+        if not pagina: return filas
+        filas.extend(pagina)
+        desde_id = pagina[-1]["id"]
+
+def _agregar_filas(cache, filas):
+    nuevas = [f for f in filas if f["id"] not in cache["ids"]]
+    if nuevas:
+        cache["filas"] = cache["filas"] + nuevas
+        cache["ids"].update(f["id"] for f in nuevas)
+
+def contar_transacciones_servidor():
+    with medir("supabase.transacciones"): return supabase.table("transacciones").select("id", count="exact", head=True).execute().count
+
+def _actualizar(cache, completa):
+    # La lectura incremental por id no ve filas editadas ni borradas en Supabase: cada TTL_RECARGA_COMPLETA,
+    # o si el conteo del servidor no cuadra con el caché, se vuelve a leer la tabla entera
+    if not completa:
+        nuevas = obtener_transacciones_nuevas(cache["ultimo_id"])
+        if nuevas:
+            _agregar_filas(cache, nuevas)
+            cache["ultimo_id"] = nuevas[-1]["id"]
+        conteo = contar_transacciones_servidor()
+        completa = conteo is not None and conteo != len(cache["filas"])
+    if completa:
+        filas = obtener_transacciones_nuevas()
+        if filas != cache["filas"]:
+            cache.update(filas=filas, ids={f["id"] for f in filas}, generacion=cache["generacion"] + 1)
+        cache["ultimo_id"], cache["completo"] = (filas[-1]["id"] if filas else None), time.time()
+        contar("transacciones", "completa")
+
 def obtener_transacciones():
-    try: return supabase.table("transacciones").select("*").execute().data
-    except: return []
+    cache = _cache_transacciones()
+    with cache["lock"]:
+        ahora = time.time()
+        leer = not cache["vigente"] or ahora - cache["leido"] > TTL_TRANSACCIONES
+        contar("transacciones", "fallo" if leer else "acierto")
+        if leer:
+            try: _actualizar(cache, completa=ahora - cache["completo"] > TTL_RECARGA_COMPLETA)
+            except Exception:
+                if not cache["leido"]: raise
+            else:
+                cache["vigente"], cache["leido"] = True, time.time()
+        return cache["filas"]
+
+def transacciones_en_cache():
+    # Sin ir a Supabase: (filas, vencidas) o None si nunca se han leído
+    cache = _cache_transacciones()
+    with cache["lock"]:
+        if not cache["leido"]: return None
+        return cache["filas"], not cache["vigente"] or time.time() - cache["leido"] > TTL_TRANSACCIONES
+
+def version_transacciones():
+    # La generación cambia cuando una recarga completa trae filas editadas o borradas
+    cache = _cache_transacciones()
+    return (cache["generacion"], len(cache["filas"]), max(cache["ids"], default=None))
+
+def invalidar_transacciones():
+    _cache_transacciones()["vigente"] = False
+
+def _incorporar_transacciones(filas):
+    # Las filas que devuelve el insert entran directo al caché; la marca de lectura no avanza
+    # para que la próxima lectura incremental recoja lo que otro dispositivo haya insertado entremedio
+    columnas = COLUMNAS_TX.split(",")
+    cache = _cache_transacciones()
+    with cache["lock"]:
+        if filas and all(f.get("id") is not None for f in filas):
+            _agregar_filas(cache, [{c: f.get(c) for c in columnas} for f in sorted(filas, key=lambda f: f["id"])])
+        else:
+            cache["vigente"] = False
+
+def recargar_transacciones():
+    cache = _cache_transacciones()
+    with cache["lock"]: cache.update(filas=[], ids=set(), ultimo_id=None, vigente=False, leido=0.0, completo=0.0, generacion=cache["generacion"] + 1)
 
 def registrar_transaccion(ticker, tipo, cantidad, precio, fx_dolar):
-    supabase.table("transacciones").insert({"ticker": ticker, "tipo": tipo, "cantidad": cantidad, "precio_usd": precio, "precio_dolar_clp": fx_dolar}).execute()
+    with medir("supabase.insert"): res = supabase.table("transacciones").insert({"ticker": ticker, "tipo": tipo, "cantidad": cantidad, "precio_usd": precio, "precio_dolar_clp": fx_dolar}).execute()
+    _incorporar_transacciones(res.data or [])
     agregar_watchlist(ticker)
 
+def registrar_transacciones_lote(filas):
+    if not filas: return
+    try:
+        with medir("supabase.insert"): res = supabase.table("transacciones").insert(filas).execute()
+        _incorporar_transacciones(res.data or [])
+    except Exception:
+        invalidar_transacciones()
+        raise
+
 def obtener_watchlist():
-    try: return [r['ticker'] for r in supabase.table("watchlist").select("ticker").execute().data]
+    try:
+        with medir("supabase.watchlist"): return [r['ticker'] for r in supabase.table("watchlist").select("ticker").execute().data]
     except: return []
 
 def agregar_watchlist(ticker):
-    try: supabase.table("watchlist").upsert({"ticker": ticker}).execute()
+    try:
+        with medir("supabase.watchlist"): supabase.table("watchlist").upsert({"ticker": ticker}).execute()
+    except: pass
+
+def agregar_watchlist_lote(tickers):
+    try:
+        with medir("supabase.watchlist"): supabase.table("watchlist").upsert([{"ticker": t} for t in tickers]).execute()
     except: pass
 
 def eliminar_watchlist(ticker):
-    try: supabase.table("watchlist").delete().eq("ticker", ticker).execute()
+    try:
+        with medir("supabase.watchlist"): supabase.table("watchlist").delete().eq("ticker", ticker).execute()
     except: pass
 
 def obtener_configuracion():
     try:
-        res = supabase.table("configuracion").select("*").eq("id", 1).execute()
+        with medir("supabase.configuracion"): res = supabase.table("configuracion").select("*").eq("id", 1).execute()
         if res.data: return res.data[0]
     except: pass
     return {"tasa_sii": 0.0, "tramo_nombre": "Exento (< $850k)"}
 
 def guardar_configuracion(tasa, nombre):
-    try: supabase.table("configuracion").upsert({"id": 1, "tasa_sii": tasa, "tramo_nombre": nombre}).execute()
+    try:
+        with medir("supabase.configuracion"): supabase.table("configuracion").upsert({"id": 1, "tasa_sii": tasa, "tramo_nombre": nombre}).execute()
     except: pass
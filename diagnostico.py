@@ -0,0 +1,147 @@
+import itertools
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+MAX_CORRIDAS = 20
+
+_lock = threading.Lock()
+_corridas = OrderedDict()
+_secuencia = itertools.count(1)
+_actual = ContextVar("corrida", default=None)
+_fallo_cache = ContextVar("fallo_cache", default=None)
+
+def iniciar_corrida(origen="app"):
+    corrida = {"id": f"{origen}-{next(_secuencia)}", "origen": origen, "inicio": time.time(), "fin": None, "spans": [], "contadores": Counter(), "pesos": {}, "cargas": [], "tramo": None}
+    with _lock:
+        _corridas[corrida["id"]] = corrida
+        while len(_corridas) > MAX_CORRIDAS: _corridas.popitem(last=False)
+    _actual.set(corrida)
+    return corrida
+
+def _registrar(corrida, nombre, t0, segundos, error=None):
+    span = {"nombre": nombre, "inicio_ms": (t0 - corrida["inicio"]) * 1000, "ms": segundos * 1000, "hilo": threading.current_thread().name, "error": error}
+    with _lock: corrida["spans"].append(span)
+
+@contextmanager
+def medir(nombre, cache=None):
+    # Con cache=<nombre>, la función cacheada llama a sin_cache() cuando se ejecuta: así se distingue acierto de fallo
+    corrida, t0, inicio = _actual.get(), time.time(), time.perf_counter()
+    marca = _fallo_cache.set([False]) if cache else None
+    error = None
+    try: yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if marca is not None:
+            fallo = _fallo_cache.get()[0]
+            _fallo_cache.reset(marca)
+            contar(cache, "fallo" if fallo else "acierto")
+        if corrida is not None: _registrar(corrida, nombre, t0, time.perf_counter() - inicio, error)
+
+def medido(nombre):
+    def decorador(funcion):
+        def envoltura(*args, **kwargs):
+            with medir(nombre): return funcion(*args, **kwargs)
+        envoltura.__name__, envoltura.__wrapped__ = funcion.__name__, funcion
+        return envoltura
+    return decorador
+
+def sin_cache():
+    marca = _fallo_cache.get()
+    if marca is not None: marca[0] = True
+
+def contar(cache, resultado, n=1):
+    corrida = _actual.get()
+    if corrida is None or not n: return
+    with _lock: corrida["contadores"][(cache, resultado)] += n
+
+def anotar_peso(nombre, n_bytes):
+    # Bytes enviados al navegador por la corrida (p. ej. el JSON de cada gráfico)
+    corrida = _actual.get()
+    if corrida is None: return
+    with _lock: corrida["pesos"][nombre] = n_bytes
+
+def anotar_carga(fila):
+    # Una lectura del almacén local hecha por la corrida (tickers, descargas, segundos)
+    corrida = _actual.get()
+    if corrida is None: return
+    with _lock: corrida["cargas"].append(fila)
+
+def enviar(pool, funcion, *args, **kwargs):
+    # Los hilos del pool heredan la corrida de quien los lanza
+    return pool.submit(copy_context().run, funcion, *args, **kwargs)
+
+def tramo(nombre):
+    # Tramos consecutivos del script: abrir uno cierra el anterior
+    corrida = _actual.get()
+    if corrida is None: return
+    ahora = time.perf_counter()
+    if corrida["tramo"] is not None:
+        anterior, t0, inicio = corrida["tramo"]
+        _registrar(corrida, anterior, t0, ahora - inicio)
+    corrida["tramo"] = (nombre, time.time(), ahora) if nombre else None
+
+def cerrar_corrida():
+    corrida = _actual.get()
+    if corrida is None: return None
+    tramo(None)
+    corrida["fin"] = time.time()
+    return corrida
+
+def ultima_corrida(origen):
+    with _lock: return next((c for c in reversed(_corridas.values()) if c["origen"] == origen and c["fin"] is not None), None)
+
+def resumen(corrida):
+    with _lock: spans = list(corrida["spans"])
+    agrupado = {}
+    for s in spans:
+        fila = agrupado.setdefault(s["nombre"], {"nombre": s["nombre"], "llamadas": 0, "ms": 0.0, "max_ms": 0.0, "errores": 0})
+        fila["llamadas"] += 1
+        fila["ms"] += s["ms"]
+        fila["max_ms"] = max(fila["max_ms"], s["ms"])
+        fila["errores"] += s["error"] is not None
+    return sorted(agrupado.values(), key=lambda f: -f["ms"])
+
+def contadores(corrida):
+    with _lock: items = list(corrida["contadores"].items())
+    por_cache = {}
+    for (cache, resultado), n in items: por_cache.setdefault(cache, {"cache": cache})[resultado] = n
+    return sorted(por_cache.values(), key=lambda f: f["cache"])
+
+def pesos(corrida):
+    with _lock: return dict(corrida["pesos"])
+
+def cargas(corrida):
+    with _lock: return list(corrida["cargas"])
+
+def exportar_jsonl(corrida):
+    with _lock: spans, cuentas, pesos_corrida = list(corrida["spans"]), list(corrida["contadores"].items()), list(corrida["pesos"].items())
+    with _lock: cargas_corrida = list(corrida["cargas"])
+    base = {"corrida": corrida["id"], "origen": corrida["origen"], "ts": corrida["inicio"]}
+    lineas = [json.dumps(dict(base, tipo="span", **s), ensure_ascii=False) for s in spans]
+    lineas += [json.dumps(dict(base, tipo="contador", cache=c, resultado=r, valor=n), ensure_ascii=False) for (c, r), n in cuentas]
+    lineas += [json.dumps(dict(base, tipo="peso", nombre=n, bytes=b), ensure_ascii=False) for n, b in pesos_corrida]
+    lineas += [json.dumps(dict(base, tipo="carga", **c), ensure_ascii=False) for c in cargas_corrida]
+    return "\n".join(lineas) + "\n"
+
+def _etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def exportar_prometheus(corrida):
+    etiqueta = f'corrida="{_etiqueta(corrida["id"])}",origen="{_etiqueta(corrida["origen"])}"'
+    lineas = ["# HELP dashboard_span_seconds Tiempo por tramo o llamada externa en la corrida.", "# TYPE dashboard_span_seconds summary"]
+    for fila in resumen(corrida):
+        nombre = _etiqueta(fila["nombre"])
+        lineas.append(f'dashboard_span_seconds_sum{{{etiqueta},nombre="{nombre}"}} {fila["ms"] / 1000:.6f}')
+        lineas.append(f'dashboard_span_seconds_count{{{etiqueta},nombre="{nombre}"}} {fila["llamadas"]}')
+    lineas += ["# HELP dashboard_cache_total Aciertos y fallos de caché en la corrida.", "# TYPE dashboard_cache_total counter"]
+    with _lock: cuentas = sorted(corrida["contadores"].items())
+    lineas += [f'dashboard_cache_total{{{etiqueta},cache="{_etiqueta(c)}",resultado="{_etiqueta(r)}"}} {n}' for (c, r), n in cuentas]
+    lineas += ["# HELP dashboard_payload_bytes Bytes enviados al navegador por elemento en la corrida.", "# TYPE dashboard_payload_bytes gauge"]
+    lineas += [f'dashboard_payload_bytes{{{etiqueta},nombre="{_etiqueta(n)}"}} {b}' for n, b in sorted(pesos(corrida).items())]
+    return "\n".join(lineas) + "\n"
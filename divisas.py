@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from almacen import obtener_historiales
+from calendario import zona_horaria
+
+TICKER_DOLAR = "CLP=X"
+DOLAR_RESPALDO = 950.0
+
+def obtener_serie_dolar(periodo="5y", sin_red=False):
+    hist = obtener_historiales([TICKER_DOLAR], periodo, "1d", sin_red=sin_red)[TICKER_DOLAR]
+    return hist['Close'].astype(float).rename("fx")
+
+def dolar_actual(serie):
+    return float(serie.iloc[-1]) if not serie.empty else DOLAR_RESPALDO
+
+def a_fechas_locales(fechas, tickers):
+    # Las transacciones se guardan en UTC y las barras en la hora local de su bolsa, sin zona:
+    # cada fecha pasa a la hora local de la bolsa de su ticker (uno para todas o uno por fila)
+    fechas = pd.to_datetime(pd.Series(fechas), errors="coerce", utc=True).reset_index(drop=True)
+    if isinstance(tickers, str): return fechas.dt.tz_convert(zona_horaria(tickers)).dt.tz_localize(None)
+    codigos, unicos = pd.factorize(pd.Series(tickers))
+    zonas = np.array([zona_horaria(t) for t in unicos], dtype=object)
+    locales = np.empty(len(fechas), dtype="datetime64[ns]")
+    for zona in set(zonas):
+        filas = np.isin(codigos, np.flatnonzero(zonas == zona))
+        locales[filas] = fechas[filas].dt.tz_convert(zona).dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    return pd.Series(locales)
+
+def dolar_en(fechas, serie, respaldo=DOLAR_RESPALDO):
+    fechas = pd.Series(pd.to_datetime(fechas)).reset_index(drop=True)
+    fx = np.full(len(fechas), float(respaldo))
+    validas = fechas.notna().to_numpy()
+    if serie.empty or not validas.any(): return fx
+    izq = pd.DataFrame({"fecha": fechas[validas].astype("datetime64[ns]"), "_orden": np.flatnonzero(validas)}).sort_values("fecha")
+    der = serie.rename("fx").rename_axis("fecha").reset_index().astype({"fecha": "datetime64[ns]"}).sort_values("fecha")
+    unido = pd.merge_asof(izq, der, on="fecha", direction="backward")
+    # Antes del primer dato de la serie se usa el dato más antiguo disponible
+    fx[unido["_orden"].to_numpy()] = unido["fx"].fillna(float(der["fx"].iloc[0])).to_numpy()
+    return fx
+
+def completar_fx_transacciones(df_tx, serie, respaldo=DOLAR_RESPALDO):
+    if df_tx.empty or 'fecha' not in df_tx.columns: return df_tx
+    df = df_tx.copy()
+    if 'precio_dolar_clp' not in df.columns: df['precio_dolar_clp'] = np.nan
+    fx_tx = pd.to_numeric(df['precio_dolar_clp'], errors='coerce')
+    faltantes = fx_tx.isna().to_numpy()
+    if faltantes.any():
+        fx_tx[faltantes] = dolar_en(a_fechas_locales(df.loc[faltantes, 'fecha'], TICKER_DOLAR), serie, respaldo)
+    df['precio_dolar_clp'] = fx_tx
+    return df
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import yfinance as yf
+from almacen import conectar
+from diagnostico import medir, contar, enviar
+
+TTL_FUNDAMENTALES = 24 * 3600
+MAX_HILOS = 8
+
+@dataclass
+class FichaFundamental:
+    ticker: str
+    trailing_pe: float = None
+    forward_pe: float = None
+    margen: float = None
+    tipo: str = None
+    actualizado: float = 0.0
+
+    @property
+    def pe(self):
+        return self.trailing_pe if self.trailing_pe is not None else self.forward_pe
+
+    @property
+    def vigente(self):
+        return time.time() - self.actualizado < TTL_FUNDAMENTALES
+
+def clasificar(ficha):
+    if ficha is None: return "sin_datos", "⚪ Datos no disponibles."
+    if ficha.margen is None: return "no_aplica", "⚪ ETF/Fondo (No aplica fundamental)."
+    margen_pct = ficha.margen * 100
+    pe_txt = f"{ficha.pe:.1f}" if ficha.pe is not None else "N/A"
+    if margen_pct < 0: return "riesgo", f"🔴 **RIESGO:** Empresa perdiendo plata (Margen: {margen_pct:.1f}%)."
+    elif ficha.pe is not None and ficha.pe > 40: return "regular", f"🟡 **REGULAR:** Gana plata pero cara (P/E: {pe_txt})."
+    else: return "solida", f"🟢 **SÓLIDA:** Negocio sano (P/E: {pe_txt}, Margen: {margen_pct:.1f}%)."
+
+def _tabla(con):
+    con.execute("CREATE TABLE IF NOT EXISTS fundamentales (ticker TEXT PRIMARY KEY, trailing_pe REAL, forward_pe REAL, margen REAL, tipo TEXT, actualizado REAL)")
+
+def leer_fichas(tickers):
+    tickers = list(tickers)
+    if not tickers: return {}
+    try:
+        with conectar() as con:
+            _tabla(con)
+            filas = con.execute(f"SELECT ticker, trailing_pe, forward_pe, margen, tipo, actualizado FROM fundamentales WHERE ticker IN ({','.join('?' * len(tickers))})", tickers).fetchall()
+        return {f[0]: FichaFundamental(*f) for f in filas}
+    except Exception: return {}
+
+def guardar_fichas(fichas):
+    if not fichas: return
+    try:
+        with conectar() as con:
+            _tabla(con)
+            con.executemany("INSERT OR REPLACE INTO fundamentales VALUES (?,?,?,?,?,?)", [(f.ticker, f.trailing_pe, f.forward_pe, f.margen, f.tipo, f.actualizado) for f in fichas])
+    except Exception: pass
+
+def _numero(valor):
+    try: return float(valor) if valor is not None else None
+    except (TypeError, ValueError): return None
+
+def descargar_ficha(ticker):
+    try:
+        with medir("yahoo.info"): info = yf.Ticker(ticker).info
+    except Exception: return None
+    if not info: return None
+    return FichaFundamental(ticker, _numero(info.get('trailingPE')), _numero(info.get('forwardPE')), _numero(info.get('profitMargins')), info.get('quoteType'), time.time())
+
+def prefetch(tickers, forzar=False):
+    tickers = list(dict.fromkeys(tickers))
+    fichas = leer_fichas(tickers)
+    pendientes = [t for t in tickers if forzar or t not in fichas or not fichas[t].vigente]
+    contar("fundamentales.disco", "acierto", len(tickers) - len(pendientes))
+    contar("fundamentales.disco", "fallo", len(pendientes))
+    if pendientes:
+        with ThreadPoolExecutor(max_workers=min(MAX_HILOS, len(pendientes))) as pool:
+            futuros = [enviar(pool, descargar_ficha, t) for t in pendientes]
+            nuevas = [f for f in (futuro.result() for futuro in futuros) if f is not None]
+        guardar_fichas(nuevas)
+        fichas.update({f.ticker: f for f in nuevas})
+    return fichas
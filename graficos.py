@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from diagnostico import medir, contar, anotar_peso
+
+PUNTOS_GRAFICO = 1200
+PUNTOS_TARJETA = 250
+MARGEN_PANEO = 0.5
+MAX_FIGURAS = 64
+
+_lock = threading.Lock()
+_figuras = OrderedDict()
+
+def lttb(x, y, puntos):
+    # Largest-Triangle-Three-Buckets: índices de los puntos que conservan la forma de la serie
+    largo = len(x)
+    if puntos >= largo or puntos < 3: return np.arange(largo)
+    bordes = np.linspace(1, largo - 1, puntos - 1).astype(int)
+    indices = np.empty(puntos, dtype=int)
+    indices[0], indices[-1] = 0, largo - 1
+    a = 0
+    for i in range(puntos - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_ini, sig_fin = (bordes[i + 1], bordes[i + 2]) if i + 2 < len(bordes) else (largo - 1, largo)
+        px, py = x[sig_ini:sig_fin].mean(), y[sig_ini:sig_fin].mean()
+        area = np.abs((x[a] - px) * (y[ini:fin] - y[a]) - (x[a] - x[ini:fin]) * (py - y[a]))
+        a = ini + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+def reducir(serie, puntos=PUNTOS_GRAFICO):
+    serie = serie.dropna()
+    if len(serie) <= puntos: return serie
+    x = serie.index.asi8.astype(float) if isinstance(serie.index, pd.DatetimeIndex) else np.arange(len(serie), dtype=float)
+    return serie.iloc[lttb(x, serie.to_numpy(dtype=float), puntos)]
+
+def recortar(serie, inicio, fin, margen=MARGEN_PANEO):
+    # Rango visible más un margen para paneo, expresado como fracción del ancho visible
+    holgura = (pd.Timestamp(fin) - pd.Timestamp(inicio)) * margen
+    return serie[(serie.index >= pd.Timestamp(inicio) - holgura) & (serie.index <= pd.Timestamp(fin) + holgura)]
+
+def preparar_serie(serie, inicio=None, fin=None, puntos=PUNTOS_GRAFICO):
+    if inicio is not None and fin is not None: serie = recortar(serie, inicio, fin)
+    return reducir(serie, puntos)
+
+def trazas_rendimiento(datos, tickers, inicio, fin, bases=None):
+    # Rendimiento % de cada ticker sobre su precio base (por defecto, el primer cierre visible) y rango Y de la vista
+    trazas, y_min, y_max = {}, float('inf'), float('-inf')
+    for ticker in tickers:
+        if ticker not in datos: continue
+        cierre_full, cierre_vista = datos[ticker]["full"]['Close'], datos[ticker]["vista"]['Close']
+        base = bases[ticker] if bases else cierre_vista.iloc[0]
+        rendimiento_vista = ((cierre_vista - base) / base) * 100
+        y_min, y_max = min(y_min, rendimiento_vista.min()), max(y_max, rendimiento_vista.max())
+        trazas[ticker] = preparar_serie(((cierre_full - base) / base) * 100, inicio, fin)
+    if y_min == float('inf'): y_min, y_max = -10, 10
+    elif y_min == y_max: y_min, y_max = y_min - 1, y_max + 1
+    return trazas, y_min, y_max
+
+def figura_tarjeta(serie, color, precio_medio, cortes):
+    fig = go.Figure(go.Scatter(x=serie.index, y=serie, line=dict(color=color)))
+    fig.add_hline(y=precio_medio, line_dash="dash", line_color="#ffd60a", annotation_text="Compra (USD)")
+    fig.update_layout(template="plotly_dark", height=150, margin=dict(l=0,r=0,t=0,b=0), dragmode="pan", xaxis=dict(visible=False, rangebreaks=cortes), yaxis=dict(visible=False))
+    return fig
+
+def huella(*partes):
+    valores = []
+    for p in partes:
+        if isinstance(p, (pd.Series, pd.DataFrame)):
+            valores.append((len(p), int(pd.util.hash_pandas_object(p).sum())))
+        else:
+            valores.append(repr(p))
+    return hash(tuple(valores))
+
+def figura(nombre, clave, construir):
+    # Reutiliza la figura si sus datos no cambiaron y registra el peso del JSON enviado al navegador
+    with _lock:
+        guardada = _figuras.get((nombre, clave))
+        if guardada is not None: _figuras.move_to_end((nombre, clave))
+    contar("figuras", "fallo" if guardada is None else "acierto")
+    if guardada is None:
+        with medir(f"plotly.construir.{nombre}"): fig = construir()
+        with medir(f"plotly.json.{nombre}"): guardada = (fig, len(fig.to_json()))
+        with _lock:
+            _figuras[(nombre, clave)] = guardada
+            while len(_figuras) > MAX_FIGURAS: _figuras.popitem(last=False)
+    anotar_peso(nombre, guardada[1])
+    return guardada[0]
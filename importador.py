@@ -0,0 +1,81 @@
+import time
+import pandas as pd
+
+TAM_LOTE = 500
+TAM_BLOQUE = 5000
+MAX_ERRORES = 200
+ALIAS = {"symbol": "ticker", "simbolo": "ticker", "activo": "ticker", "accion": "ticker", "instrumento": "ticker",
+         "type": "tipo", "side": "tipo", "operacion": "tipo", "movimiento": "tipo",
+         "quantity": "cantidad", "qty": "cantidad", "shares": "cantidad", "cuotas": "cantidad",
+         "price": "precio_usd", "precio": "precio_usd", "precio_usd": "precio_usd",
+         "fx": "precio_dolar_clp", "dolar": "precio_dolar_clp", "tipo_cambio": "precio_dolar_clp", "usdclp": "precio_dolar_clp",
+         "date": "fecha", "trade_date": "fecha", "fecha_operacion": "fecha"}
+TIPOS = {"COMPRA": "COMPRA", "BUY": "COMPRA", "C": "COMPRA", "VENTA": "VENTA", "SELL": "VENTA", "V": "VENTA"}
+
+def _normalizar_columnas(df):
+    nombres = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df.set_axis([ALIAS.get(c, c) for c in nombres], axis=1)
+
+def _numero(serie):
+    texto = serie.fillna("").astype(str).str.strip().str.replace(r"^(-?\d+),(\d+)$", r"\1.\2", regex=True)
+    return pd.to_numeric(texto, errors="coerce")
+
+def _fecha(serie):
+    # Año primero (AAAA-MM-DD, con o sin hora) se lee como ISO: con dayfirst, pandas invierte día y mes cuando el día es <= 12.
+    # Solo lo que no es ISO (DD/MM/AAAA de las cartolas) pasa por dayfirst
+    texto = serie.astype("string").str.strip()
+    fechas = pd.to_datetime(texto, errors="coerce", format="ISO8601", utc=True)
+    resto = fechas.isna() & texto.fillna("").ne("")
+    if resto.any(): fechas[resto] = pd.to_datetime(texto[resto], errors="coerce", format="mixed", dayfirst=True, utc=True)
+    return fechas
+
+def validar_bloque(bloque, fila_inicial=0):
+    df = _normalizar_columnas(bloque)
+    faltantes = [c for c in ("ticker", "tipo", "cantidad", "precio_usd") if c not in df.columns]
+    if faltantes: raise ValueError(f"Faltan columnas: {', '.join(faltantes)}")
+    limpio = pd.DataFrame({
+        "ticker": df["ticker"].fillna("").astype(str).str.strip().str.upper(),
+        "tipo": df["tipo"].fillna("").astype(str).str.strip().str.upper().map(TIPOS),
+        "cantidad": _numero(df["cantidad"]),
+        "precio_usd": _numero(df["precio_usd"]),
+        "precio_dolar_clp": _numero(df["precio_dolar_clp"]) if "precio_dolar_clp" in df.columns else float("nan"),
+    })
+    if "fecha" in df.columns: limpio["fecha"] = _fecha(df["fecha"])
+
+    motivos = pd.Series("", index=df.index)
+    motivos[limpio["ticker"] == ""] += "ticker vacío; "
+    motivos[limpio["tipo"].isna()] += "tipo debe ser COMPRA/VENTA; "
+    motivos[~(limpio["cantidad"] > 0)] += "cantidad inválida; "
+    motivos[~(limpio["precio_usd"] > 0)] += "precio_usd inválido; "
+    motivos[limpio["precio_dolar_clp"].notna() & ~(limpio["precio_dolar_clp"] > 0)] += "precio_dolar_clp inválido; "
+    if "fecha" in df.columns: motivos[limpio["fecha"].isna() & df["fecha"].notna()] += "fecha inválida; "
+
+    ok = motivos == ""
+    errores = [{"fila": fila_inicial + i + 2, "motivo": m.rstrip("; ")} for i, m in zip(range(len(df)), motivos) if m]
+    validas = limpio[ok.to_numpy()]
+    if "fecha" in validas.columns: validas = validas.assign(fecha=validas["fecha"].map(lambda f: f.isoformat() if pd.notna(f) else None))
+    filas = [{k: v for k, v in r.items() if not (v is None or (isinstance(v, float) and v != v))} for r in validas.to_dict("records")]
+    return filas, errores
+
+def importar_transacciones(archivo, insertar_lote, agregar_tickers, dry_run=False, tam_lote=TAM_LOTE):
+    t0 = time.perf_counter()
+    resumen = {"filas": 0, "validas": 0, "insertadas": 0, "errores": [], "tickers": [], "dry_run": dry_run}
+    tickers = {}
+    try:
+        for bloque in pd.read_csv(archivo, sep=None, engine="python", dtype=str, chunksize=TAM_BLOQUE):
+            filas, errores = validar_bloque(bloque, resumen["filas"])
+            resumen["filas"] += len(bloque)
+            resumen["validas"] += len(filas)
+            resumen["errores"].extend(errores[:MAX_ERRORES - len(resumen["errores"])])
+            tickers.update(dict.fromkeys(f["ticker"] for f in filas))
+            if dry_run: continue
+            for i in range(0, len(filas), tam_lote):
+                insertar_lote(filas[i:i + tam_lote])
+                resumen["insertadas"] += len(filas[i:i + tam_lote])
+        if tickers and not dry_run: agregar_tickers(list(tickers))
+    except Exception as e:
+        resumen["errores"].append({"fila": None, "motivo": f"Importación detenida: {e}"})
+    resumen["tickers"] = list(tickers)
+    resumen["segundos"] = time.perf_counter() - t0
+    resumen["filas_por_seg"] = resumen["filas"] / resumen["segundos"] if resumen["segundos"] > 0 else 0.0
+    return resumen
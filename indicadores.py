@@ -0,0 +1,112 @@
+import threading
+import numpy as np
+import pandas as pd
+from diagnostico import contar
+
+PERIODO_RSI = 14
+
+_lock = threading.Lock()
+_estados = {}
+
+def apilar(series):
+    # Matriz (barras x tickers) alineada a la derecha: la última fila es la última barra de cada ticker
+    largo = max((len(s) for s in series), default=0)
+    matriz = np.full((largo, len(series)), np.nan)
+    for j, s in enumerate(series):
+        if len(s): matriz[largo - len(s):, j] = s
+    return matriz
+
+def _ewm_wilder(valores, inicial, alpha):
+    # Igual a Series.ewm(alpha=alpha, adjust=False).mean(), columna por columna y sin NaN intermedios
+    promedios = np.empty_like(valores)
+    actual = inicial.copy()
+    for i, fila in enumerate(valores):
+        sin_inicio = np.isnan(actual)
+        actual = np.where(sin_inicio, fila, np.where(np.isnan(fila), actual, ((1 - alpha) * actual + alpha * fila) / ((1 - alpha) + alpha)))
+        promedios[i] = actual
+    return promedios
+
+def _rsi_desde(cierres, sube_previo, baja_previo, periodo=PERIODO_RSI):
+    # La fila i del resultado corresponde a la fila i + 1 de cierres
+    delta = np.diff(cierres, axis=0)
+    sube = _ewm_wilder(np.clip(delta, 0, None), sube_previo, 1 / periodo)
+    baja = _ewm_wilder(np.clip(-delta, 0, None), baja_previo, 1 / periodo)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - (100 / (1 + sube / baja))
+    return rsi, sube, baja
+
+def rsi_actual(historiales, intervalo, periodo=PERIODO_RSI):
+    # El estado guardado corresponde a la penúltima barra: la última puede seguir formándose
+    with _lock: estados = {t: _estados.get((t, intervalo, periodo)) for t in historiales}
+    resultado, series, previos, nuevos, previos_validos = {}, {}, {}, {}, set()
+    for t, hist in historiales.items():
+        if hist.empty: continue
+        cierres, estado = hist['Close'].to_numpy(dtype=float), estados[t]
+        pos = hist.index.searchsorted(estado["ts"]) if estado is not None else len(cierres)
+        if pos < len(cierres) and hist.index[pos] == estado["ts"] and cierres[pos] == estado["close"]:
+            pendientes = cierres[pos + 1:]
+            if len(pendientes) == 0:
+                resultado[t] = estado["rsi"]
+                continue
+            series[t] = np.concatenate([[estado["close"]], pendientes])
+            previos[t] = (estado["sube"], estado["baja"])
+            previos_validos.add(t)
+        else:
+            series[t] = cierres
+            previos[t] = (np.nan, np.nan)
+    if series:
+        tickers = list(series)
+        matriz = apilar([series[t] for t in tickers])
+        rsi, sube, baja = _rsi_desde(matriz, np.array([previos[t][0] for t in tickers]), np.array([previos[t][1] for t in tickers]), periodo)
+        for j, t in enumerate(tickers):
+            resultado[t] = float(rsi[-1, j]) if len(rsi) else float("nan")
+            if t in previos_validos and len(series[t]) == 2:
+                # Con una sola barra nueva la penúltima sigue siendo la del estado anterior
+                nuevos[t] = dict(estados[t], rsi=resultado[t])
+            elif len(series[t]) >= 2:
+                con_promedio = len(series[t]) >= 3
+                nuevos[t] = {"ts": historiales[t].index[-2], "close": float(matriz[-2, j]), "sube": float(sube[-2, j]) if con_promedio else float("nan"), "baja": float(baja[-2, j]) if con_promedio else float("nan"), "rsi": resultado[t]}
+    with _lock:
+        for t, e in nuevos.items(): _estados[(t, intervalo, periodo)] = e
+    contar("indicadores.rsi", "fallo", len(series) - len(previos_validos))
+    contar("indicadores.rsi", "acierto", len(resultado) - len(series) + len(previos_validos))
+    return resultado
+
+def _ultimo(df):
+    return df.ffill().iloc[-1] if len(df) else pd.Series(dtype=float)
+
+def cruce_medias(precios, corta=50, larga=200):
+    sma_corta, sma_larga = precios.rolling(corta, min_periods=corta).mean(), precios.rolling(larga, min_periods=larga).mean()
+    arriba = sma_corta > sma_larga
+    cambio = arriba.ne(arriba.shift()) & sma_larga.notna() & sma_larga.shift().notna()
+    return pd.DataFrame({"sma_corta": _ultimo(sma_corta), "sma_larga": _ultimo(sma_larga), "tendencia_alcista": arriba.iloc[-1] & sma_larga.iloc[-1].notna(), "cruce_reciente": cambio.tail(5).any()})
+
+def cruce_exponencial(precios, corta=12, larga=26):
+    ema_corta, ema_larga = precios.ewm(span=corta, adjust=False).mean(), precios.ewm(span=larga, adjust=False).mean()
+    return pd.DataFrame({"ema_corta": _ultimo(ema_corta), "ema_larga": _ultimo(ema_larga)})
+
+def macd(precios, corta=12, larga=26, senal=9):
+    linea = precios.ewm(span=corta, adjust=False).mean() - precios.ewm(span=larga, adjust=False).mean()
+    senal_macd = linea.ewm(span=senal, adjust=False).mean()
+    return pd.DataFrame({"macd": _ultimo(linea), "macd_senal": _ultimo(senal_macd), "macd_hist": _ultimo(linea - senal_macd)})
+
+def bollinger(precios, ventana=20, desviaciones=2.0):
+    media = precios.rolling(ventana, min_periods=ventana).mean()
+    desv = precios.rolling(ventana, min_periods=ventana).std()
+    superior, inferior = media + desviaciones * desv, media - desviaciones * desv
+    return pd.DataFrame({"bb_superior": _ultimo(superior), "bb_inferior": _ultimo(inferior), "bb_pct": _ultimo((precios - inferior) / (superior - inferior))})
+
+INDICADORES = {"cruce_medias": cruce_medias, "cruce_exponencial": cruce_exponencial, "macd": macd, "bollinger": bollinger}
+
+def calcular_senales(historiales, indicadores=None):
+    # Matriz alineada por posición (última barra de cada ticker al final): una sola pasada vectorizada por indicador
+    tickers = [t for t, h in historiales.items() if not h.empty]
+    if not tickers: return pd.DataFrame()
+    precios = pd.DataFrame(apilar([historiales[t]['Close'].to_numpy(dtype=float) for t in tickers]), columns=tickers)
+    return pd.concat([INDICADORES[n](precios) for n in (indicadores or INDICADORES)], axis=1)
+
+def describir_tendencia(senales):
+    if pd.isna(senales.get("sma_larga")): return "⚪ Sin historia"
+    flecha = "📈 Alcista" if senales["tendencia_alcista"] else "📉 Bajista"
+    impulso = " · MACD +" if senales.get("macd_hist", 0) > 0 else " · MACD −"
+    return ("✨ " if senales["cruce_reciente"] else "") + flecha + impulso
@@ -0,0 +1,80 @@
+import threading
+from collections import deque
+import pandas as pd
+from diagnostico import contar
+
+_lock = threading.Lock()
+_snapshot = {}
+
+def _estado_vacio():
+    return {"lotes": deque(), "ganancia": 0.0, "ultimo_precio_venta": 0.0}
+
+def _huella_fx(fx):
+    # El dólar de las filas sin precio_dolar_clp sale de la serie CLP=X o del respaldo: database no lo ve cambiar
+    return hash(fx.tobytes())
+
+def _aplicar(estado, tipos, cantidades, precios, fxs):
+    lotes = estado["lotes"]
+    gan = estado["ganancia"]
+    for tipo, cant, precio, fx_tx in zip(tipos, cantidades, precios, fxs):
+        if tipo == 'COMPRA':
+            lotes.append([cant, precio, fx_tx])
+        elif tipo == 'VENTA':
+            estado["ultimo_precio_venta"] = precio
+            cant_a_vender = cant
+            while cant_a_vender > 0 and lotes:
+                compra_antigua = lotes[0]
+                qty_vendida = min(compra_antigua[0], cant_a_vender)
+                gan += (qty_vendida * precio * fx_tx) - (qty_vendida * compra_antigua[1] * compra_antigua[2])
+                if compra_antigua[0] <= cant_a_vender:
+                    cant_a_vender -= qty_vendida
+                    lotes.popleft()
+                else:
+                    compra_antigua[0] -= qty_vendida
+                    cant_a_vender = 0
+    estado["ganancia"] = gan
+
+def calcular_libro_mayor(df_tx, fx_respaldo, version=None):
+    # Con version=(generación, filas, id máximo) de database.version_transacciones el estado de los lotes queda en memoria
+    # y la llamada siguiente solo repite las filas de id mayor; sin version se recalcula todo
+    if df_tx.empty: return {}, 0.0
+    df = df_tx.assign(fecha=df_tx['fecha'].astype(str))
+    if 'precio_dolar_clp' not in df.columns: df['precio_dolar_clp'] = None
+    incremental = version is not None and 'id' in df.columns
+    # Empates de fecha por id: una fila nueva con la misma fecha que la marca queda después de las anteriores
+    df = df.sort_values(['fecha', 'id'] if incremental else 'fecha', kind='stable')
+    df['fx'] = pd.to_numeric(df['precio_dolar_clp'], errors='coerce').fillna(fx_respaldo).astype(float)
+
+    with _lock:
+        estados, pendientes = {}, df
+        if incremental and _snapshot.get("generacion") == version[0]:
+            previas = (df['id'] <= _snapshot["id"]).to_numpy()
+            nuevas = df[~previas]
+            if previas.sum() == _snapshot["n"] and (nuevas.empty or nuevas['fecha'].iloc[0] >= _snapshot["marca"]) and _huella_fx(df['fx'].to_numpy()[previas]) == _snapshot["fx"]:
+                estados, pendientes = _snapshot["tickers"], nuevas
+        contar("libro_mayor.snapshot", "fallo" if pendientes is df else "acierto")
+        # El estado se modifica en el lugar: si la repetición falla a medias no debe quedar como válido
+        if incremental: _snapshot.clear()
+
+        for ticker, grupo in pendientes.groupby('ticker', sort=False):
+            _aplicar(estados.setdefault(ticker, _estado_vacio()), grupo['tipo'].tolist(), grupo['cantidad'].astype(float).tolist(), grupo['precio_usd'].astype(float).tolist(), grupo['fx'].tolist())
+
+        if incremental:
+            _snapshot.update(generacion=version[0], id=df['id'].max(), n=len(df), marca=df['fecha'].iloc[-1], fx=_huella_fx(df['fx'].to_numpy()), tickers=estados)
+
+        mis_posiciones = {}
+        ganancia_realizada_total_clp = 0.0
+        for ticker in df_tx['ticker'].unique():
+            estado = estados[ticker]
+            lote_compras = estado["lotes"]
+            cuotas_restantes = sum(l[0] for l in lote_compras)
+            costo_total_usd = sum(l[0] * l[1] for l in lote_compras)
+            costo_total_clp = sum(l[0] * l[1] * l[2] for l in lote_compras)
+            mis_posiciones[ticker] = {
+                'cuotas': cuotas_restantes,
+                'precio_medio_usd': costo_total_usd / cuotas_restantes if cuotas_restantes > 0 else 0.0,
+                'costo_total_clp': costo_total_clp,
+                'ultimo_precio_venta': estado["ultimo_precio_venta"]
+            }
+            ganancia_realizada_total_clp += estado["ganancia"]
+        return mis_posiciones, ganancia_realizada_total_clp
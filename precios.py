@@ -0,0 +1,58 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import yfinance as yf
+from diagnostico import medir, enviar
+
+MAX_HILOS = 8
+TIMEOUT_TICKER = 10
+REINTENTOS = 3
+ESPERA_BASE = 0.5
+
+def _limpiar(hist):
+    if hist is None or hist.empty: return pd.DataFrame()
+    hist = hist.dropna(subset=['Close'])
+    if hist.index.tz is not None:
+        hist.index = hist.index.tz_localize(None)
+    return hist
+
+def descargar_historial(ticker, **parametros):
+    # yfinance registra los errores de red en el log y devuelve un DataFrame vacío: vacío cuenta como intento fallido
+    for intento in range(REINTENTOS):
+        try:
+            with medir("yahoo.history"): hist = _limpiar(yf.Ticker(ticker).history(timeout=TIMEOUT_TICKER, **parametros))
+            if not hist.empty: return hist
+        except Exception: pass
+        if intento < REINTENTOS - 1: time.sleep(ESPERA_BASE * 2 ** intento)
+    return pd.DataFrame()
+
+def _cronometrada(inicios, ticker, parametros):
+    inicios[ticker] = time.monotonic()
+    return descargar_historial(ticker, **parametros)
+
+def descargar_en_paralelo(peticiones):
+    # peticiones: {ticker: {"period"/"start": ..., "interval": ...}}
+    if not peticiones: return {}
+    # El límite de cada ticker corre desde que un hilo lo toma, no desde que entra a la cola;
+    # el tope global alcanza para ceil(n / hilos) tandas por si algún hilo no vuelve nunca
+    hilos = min(MAX_HILOS, len(peticiones))
+    limite = TIMEOUT_TICKER * REINTENTOS + ESPERA_BASE * 2 ** REINTENTOS
+    tope = time.monotonic() + limite * math.ceil(len(peticiones) / hilos)
+    resultados, inicios = {}, {}
+    # Sin "with": su __exit__ espera a todos los hilos y el límite dejaría de cortar la espera
+    pool = ThreadPoolExecutor(max_workers=hilos)
+    try:
+        futuros = {enviar(pool, _cronometrada, inicios, t, p): t for t, p in peticiones.items()}
+        pendientes = set(futuros)
+        while pendientes:
+            ahora = time.monotonic()
+            plazos = [inicios[futuros[f]] + limite for f in pendientes if futuros[f] in inicios]
+            listos, pendientes = wait(pendientes, timeout=max(0.0, min(plazos + [ahora + limite, tope]) - ahora), return_when=FIRST_COMPLETED)
+            for f in listos: resultados[futuros[f]] = f.result()
+            ahora = time.monotonic()
+            vencidos = {f for f in pendientes if ahora >= tope or (futuros[f] in inicios and ahora >= inicios[futuros[f]] + limite)}
+            for f in vencidos: resultados[futuros[f]] = pd.DataFrame()
+            pendientes -= vencidos
+    finally: pool.shutdown(wait=False, cancel_futures=True)
+    return {t: resultados[t] for t in peticiones}
@@ -0,0 +1,178 @@
+import threading
+import time
+from almacen import obtener_historiales
+from divisas import obtener_serie_dolar
+import fundamentales
+import database
+from simbolos import nombres_conocidos, resolver_nombres
+import diagnostico
+
+INTERVALO_REFRESCO = 60
+VIGENCIA_SUSCRIPCION = 30 * 60
+REINTENTO_FALLIDAS = 10 * 60
+
+_lock = threading.Lock()
+_despertar = threading.Event()
+_estado = {"hilo": None, "suscripciones": {}, "historiales": {}, "actualizado": {}, "fx": None, "fx_actualizado": None, "fichas": {}, "fichas_pedidas": set(), "nombres": {}, "nombres_pedidos": set(), "esperando": set(), "fallidas": {}, "errores": 0}
+
+def iniciar():
+    with _lock:
+        if _estado["hilo"] is None or not _estado["hilo"].is_alive():
+            _estado["hilo"] = threading.Thread(target=_ciclo, name="refresco-precios", daemon=True)
+            _estado["hilo"].start()
+    return _estado
+
+def registrar(tickers, periodo, intervalo):
+    nuevos = False
+    with _lock:
+        for t in tickers:
+            clave = (t, periodo, intervalo)
+            nuevos |= clave not in _estado["suscripciones"]
+            _estado["suscripciones"][clave] = time.time()
+    if nuevos: _despertar.set()
+
+def _vigentes():
+    ahora = time.time()
+    with _lock:
+        vencidas = [c for c, visto in _estado["suscripciones"].items() if ahora - visto > VIGENCIA_SUSCRIPCION]
+        for c in vencidas: del _estado["suscripciones"][c]
+        return list(_estado["suscripciones"])
+
+def _esperar(claves):
+    # Lo que la pantalla no tiene lo baja el hilo de fondo; lo que falló hace poco no se vuelve a esperar
+    ahora = time.time()
+    with _lock:
+        nuevas = [c for c in claves if ahora - _estado["fallidas"].get(c, 0.0) > REINTENTO_FALLIDAS]
+        _estado["esperando"].update(nuevas)
+    if nuevas: _despertar.set()
+
+def _obtenido(clave):
+    if clave == "fx": return _estado["fx"] is not None
+    if clave == "transacciones":
+        en_cache = database.transacciones_en_cache()
+        return en_cache is not None and not en_cache[1]
+    if clave[0] == "ficha": return clave[1] in _estado["fichas"]
+    if clave[0] == "nombre": return clave[1] in _estado["nombres"]
+    return clave in _estado["historiales"]
+
+def pendientes():
+    with _lock: return len(_estado["esperando"])
+
+def _refrescar_precios(suscripciones):
+    por_config = {}
+    for t, periodo, intervalo in suscripciones: por_config.setdefault((periodo, intervalo), []).append(t)
+    for (periodo, intervalo), tickers in por_config.items():
+        historiales = obtener_historiales(tickers, periodo, intervalo)
+        ahora = time.time()
+        with _lock:
+            for t, hist in historiales.items():
+                if hist.empty: continue
+                _estado["historiales"][(t, periodo, intervalo)] = hist
+                _estado["actualizado"][(t, intervalo)] = ahora
+
+def _refrescar_fx():
+    serie = obtener_serie_dolar()
+    if not serie.empty:
+        with _lock: _estado["fx"], _estado["fx_actualizado"] = serie, time.time()
+
+def _refrescar_fichas(tickers):
+    fichas = fundamentales.prefetch(tickers)
+    with _lock: _estado["fichas"].update(fichas)
+
+def _refrescar_nombres(tickers):
+    if not tickers: return
+    # resolver_nombres devuelve el mismo ticker cuando Yahoo no lo encuentra: eso no cuenta como nombre
+    encontrados = {t: n for t, n in resolver_nombres(tickers).items() if n != t}
+    with _lock: _estado["nombres"].update(encontrados)
+
+def _refrescar_transacciones():
+    # Solo si la pantalla ya las leyó: obtener_transacciones no va a Supabase mientras no venza el TTL
+    if database.transacciones_en_cache() is not None: database.obtener_transacciones()
+
+def refrescar_ahora():
+    suscripciones = _vigentes()
+    with _lock:
+        pedidas, _estado["fichas_pedidas"] = _estado["fichas_pedidas"], set()
+        nombres, _estado["nombres_pedidos"] = sorted(_estado["nombres_pedidos"]), set()
+    fichas = list(dict.fromkeys([t for t, _, _ in suscripciones] + sorted(pedidas)))
+    tareas = (("fondo.transacciones", _refrescar_transacciones), ("fondo.fx", _refrescar_fx), ("fondo.precios", lambda: _refrescar_precios(suscripciones)), ("fondo.fichas", lambda: _refrescar_fichas(fichas)), ("fondo.nombres", lambda: _refrescar_nombres(nombres)))
+    for nombre, tarea in tareas:
+        try:
+            with diagnostico.medir(nombre): tarea()
+        except Exception: _estado["errores"] += 1
+
+def _ciclo():
+    while True:
+        diagnostico.iniciar_corrida("refresco")
+        with _lock: atendidas = set(_estado["esperando"])
+        refrescar_ahora()
+        ahora = time.time()
+        with _lock:
+            _estado["esperando"] -= atendidas
+            for clave in atendidas:
+                if not _obtenido(clave): _estado["fallidas"][clave] = ahora
+        diagnostico.cerrar_corrida()
+        _despertar.wait(INTERVALO_REFRESCO)
+        _despertar.clear()
+
+def historiales(tickers, periodo, intervalo):
+    registrar(tickers, periodo, intervalo)
+    with _lock: listos = {t: _estado["historiales"].get((t, periodo, intervalo)) for t in tickers}
+    faltantes = [t for t, h in listos.items() if h is None]
+    diagnostico.contar("refresco.instantanea", "acierto", len(listos) - len(faltantes))
+    diagnostico.contar("refresco.instantanea", "fallo", len(faltantes))
+    if faltantes:
+        # Sin instantánea: se lee el almacén local; lo que nunca se ha descargado queda vacío hasta que lo baje el hilo de fondo
+        locales = obtener_historiales(faltantes, periodo, intervalo, sin_red=True)
+        _esperar([(t, periodo, intervalo) for t, h in locales.items() if h.empty])
+        listos.update(locales)
+    return listos
+
+def serie_fx():
+    with _lock: serie = _estado["fx"]
+    if serie is None:
+        serie = obtener_serie_dolar(sin_red=True)
+        if serie.empty: _esperar(["fx"])
+    return serie
+
+def fichas_fundamentales(tickers):
+    with _lock: fichas = {t: _estado["fichas"][t] for t in tickers if t in _estado["fichas"]}
+    faltantes = [t for t in tickers if t not in fichas]
+    diagnostico.contar("refresco.fichas", "acierto", len(fichas))
+    diagnostico.contar("refresco.fichas", "fallo", len(faltantes))
+    if faltantes:
+        # Lo que está en disco se muestra aunque esté vencido; el resto (y lo vencido) lo baja el hilo de fondo
+        en_disco = fundamentales.leer_fichas(faltantes)
+        with _lock:
+            _estado["fichas"].update(en_disco)
+            _estado["fichas_pedidas"].update(faltantes)
+        fichas.update(en_disco)
+        _esperar([("ficha", t) for t in faltantes if t not in en_disco])
+    return fichas
+
+def nombres(tickers):
+    with _lock: conocidos = {t: _estado["nombres"][t] for t in tickers if t in _estado["nombres"]}
+    faltantes = [t for t in tickers if t not in conocidos]
+    if faltantes:
+        # Lo que está en disco se muestra de inmediato; lo que nunca se ha buscado lo busca el hilo de fondo en Yahoo
+        en_disco = nombres_conocidos(faltantes)
+        buscar = [t for t in faltantes if t not in en_disco]
+        with _lock:
+            _estado["nombres"].update(en_disco)
+            _estado["nombres_pedidos"].update(buscar)
+        conocidos.update(en_disco)
+        _esperar([("nombre", t) for t in buscar])
+    return conocidos
+
+def transacciones():
+    # La primera lectura va a Supabase (sin filas no hay cartera que mostrar); después la pantalla lee el caché
+    # y, vencido el TTL, el hilo de fondo trae lo nuevo y repinta
+    en_cache = database.transacciones_en_cache()
+    if en_cache is None: return database.obtener_transacciones()
+    filas, vencidas = en_cache
+    diagnostico.contar("refresco.transacciones", "fallo" if vencidas else "acierto")
+    if vencidas: _esperar(["transacciones"])
+    return filas
+
+def ultima_actualizacion(ticker, intervalo):
+    with _lock: return _estado["actualizado"].get((ticker, intervalo))
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from almacen import conectar
+from diagnostico import medir, contar, enviar
+
+URL_BUSQUEDA = "https://query2.finance.yahoo.com/v1/finance/search"
+TIMEOUT = (3, 5)
+TTL_CACHE = 3600
+MAX_CACHE = 256
+MAX_HILOS = 8
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_sesion = None
+
+def _obtener_sesion():
+    global _sesion
+    with _lock:
+        if _sesion is None:
+            _sesion = requests.Session()
+            _sesion.headers.update({'User-Agent': 'Mozilla/5.0'})
+            adaptador = HTTPAdapter(pool_connections=MAX_HILOS, pool_maxsize=MAX_HILOS, max_retries=1)
+            _sesion.mount("https://", adaptador)
+        return _sesion
+
+def _leer_cache(clave):
+    with _lock:
+        entrada = _cache.get(clave)
+        if entrada is None: return None
+        if time.time() - entrada[0] > TTL_CACHE:
+            del _cache[clave]
+            return None
+        _cache.move_to_end(clave)
+        return entrada[1]
+
+def _escribir_cache(clave, resultados):
+    with _lock:
+        _cache[clave] = (time.time(), resultados)
+        _cache.move_to_end(clave)
+        while len(_cache) > MAX_CACHE: _cache.popitem(last=False)
+
+def _tabla(con):
+    con.execute("CREATE TABLE IF NOT EXISTS simbolos (ticker TEXT PRIMARY KEY, nombre TEXT)")
+
+def guardar_nombres(nombres):
+    if not nombres: return
+    try:
+        with conectar() as con:
+            _tabla(con)
+            con.executemany("INSERT OR REPLACE INTO simbolos VALUES (?, ?)", list(nombres.items()))
+    except Exception: pass
+
+def nombres_conocidos(tickers):
+    tickers = list(tickers)
+    if not tickers: return {}
+    try:
+        with conectar() as con:
+            _tabla(con)
+            filas = con.execute(f"SELECT ticker, nombre FROM simbolos WHERE ticker IN ({','.join('?' * len(tickers))})", tickers).fetchall()
+        return dict(filas)
+    except Exception: return {}
+
+def buscar_multiples_tickers(texto):
+    clave = texto.strip().lower()
+    if not clave: return []
+    resultados = _leer_cache(clave)
+    contar("simbolos.busqueda", "fallo" if resultados is None else "acierto")
+    if resultados is not None: return resultados
+    try:
+        with medir("yahoo.search"): res = _obtener_sesion().get(URL_BUSQUEDA, params={"q": texto.strip()}, timeout=TIMEOUT).json()
+    except Exception: return []
+    resultados = []
+    for q in res.get('quotes', []):
+        if 'symbol' in q:
+            simbolo = q['symbol']
+            resultados.append({"symbol": simbolo, "name": q.get('shortname', simbolo), "label": f"{simbolo} - {q.get('shortname', simbolo)}"})
+    _escribir_cache(clave, resultados)
+    guardar_nombres({r["symbol"]: r["name"] for r in resultados})
+    return resultados
+
+def _nombre_en_yahoo(ticker):
+    resultados = buscar_multiples_tickers(ticker)
+    exacto = [r for r in resultados if r["symbol"].upper() == ticker.upper()]
+    return (exacto or resultados or [{"name": None}])[0]["name"]
+
+def resolver_nombres(tickers):
+    tickers = list(dict.fromkeys(tickers))
+    nombres = nombres_conocidos(tickers)
+    faltantes = [t for t in tickers if t not in nombres]
+    contar("simbolos.disco", "acierto", len(tickers) - len(faltantes))
+    contar("simbolos.disco", "fallo", len(faltantes))
+    if faltantes:
+        with ThreadPoolExecutor(max_workers=min(MAX_HILOS, len(faltantes))) as pool:
+            futuros = {t: enviar(pool, _nombre_en_yahoo, t) for t in faltantes}
+            encontrados = {t: n for t, n in ((t, f.result()) for t, f in futuros.items()) if n}
+        guardar_nombres(encontrados)
+        nombres.update(encontrados)
+    return {t: nombres.get(t, t) for t in tickers}